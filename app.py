@@ -1,11 +1,22 @@
 import streamlit as st
-import pandas as pd
-from io import BytesIO
 import datetime
+import os
+
+import dashboard
+import engine
+import ledger
+import refstore
+from daily import OUTPUT_COLS
+from export import FORMATS, export
+from uploads import read_upload
 
 st.title("Excel 銷售日報表 Mapping 工具")
 
-tab_daily, tab_monthly = st.tabs(["📋 每日作業", "📋 月底作業"])
+tab_daily, tab_monthly, tab_dashboard = st.tabs(["📋 每日作業", "📋 月底作業", "📊 分析"])
+
+# 最近一次的處理結果 {'daily' / 'monthly': (產生時間, DataFrame)}，供分析頁使用
+if 'results' not in st.session_state:
+    st.session_state.results = {}
 
 # ===== 每日作業 =====
 with tab_daily:
@@ -14,229 +25,84 @@ with tab_daily:
 
     sales_file = st.file_uploader("41110000 銷貨收入", type="xlsx", key="d_sales")
     returns_file = st.file_uploader("41700000 銷貨退回 (選填)", type="xlsx", key="d_returns")
-    zsdc_file = st.file_uploader("zsdc", type="xlsx", key="d_zsdc")
-    contract_file = st.file_uploader("合約管理", type="xlsx", key="d_contract")
-    product_file = st.file_uploader("產品群", type="xlsx", key="d_product")
+    reference_source = st.radio("主檔來源", ['upload', 'store'], format_func=lambda f: {'upload': '上傳主檔', 'store': '參考資料庫'}[f], horizontal=True, key="d_ref_source")
+    if reference_source == 'upload':
+        zsdc_file = st.file_uploader("zsdc", type="xlsx", key="d_zsdc")
+        contract_file = st.file_uploader("合約管理", type="xlsx", key="d_contract")
+        product_file = st.file_uploader("產品群", type="xlsx", key="d_product")
+        store_as_of = None
+    else:
+        zsdc_file = contract_file = product_file = None
+        store_as_of = st.date_input("主檔版本（查詢該匯入日期當時的資料）", value=datetime.datetime.now().date(), key="d_as_of")
 
     current_month = datetime.datetime.now().month
     month = st.number_input("設定月份 (預設當月)", min_value=1, max_value=12, value=current_month, key="d_month")
     start_date = st.date_input("開始日期 (篩選輸入日期)", value=datetime.datetime.now().date() - datetime.timedelta(days=7), key="d_start")
     end_date = st.date_input("結束日期 (篩選輸入日期)", value=datetime.datetime.now().date(), key="d_end")
 
-    if st.button("處理檔案", key="btn_daily") and sales_file and zsdc_file:
-        try:
-            df_sales = pd.read_excel(sales_file, sheet_name='工作表1')
-            df_zsdc = pd.read_excel(zsdc_file, sheet_name='工作表1')
-            if returns_file:
-                df_returns = pd.read_excel(returns_file, sheet_name='工作表1')
-            else:
-                df_returns = pd.DataFrame()
-            if contract_file:
-                df_contract = pd.read_excel(contract_file, sheet_name='已篩選')
-            else:
-                df_contract = pd.DataFrame()
-            if product_file:
-                df_product = pd.read_excel(product_file, sheet_name='工作表1')
-            else:
-                df_product = pd.DataFrame()
-
-            # 篩選輸入日期
-            df_sales['輸入日期'] = pd.to_datetime(df_sales['輸入日期'], errors='coerce')
-            df_sales = df_sales[(df_sales['輸入日期'] >= pd.to_datetime(start_date)) & (df_sales['輸入日期'] <= pd.to_datetime(end_date))]
-            if not df_returns.empty:
-                df_returns['輸入日期'] = pd.to_datetime(df_returns['輸入日期'], errors='coerce')
-                df_returns = df_returns[(df_returns['輸入日期'] >= pd.to_datetime(start_date)) & (df_returns['輸入日期'] <= pd.to_datetime(end_date))]
-
-            df_sales = df_sales.rename(columns={'項目.1': 'sales_item'})
-            if not df_returns.empty:
-                df_returns = df_returns.rename(columns={'項目.1': 'sales_item'})
-
-            common_cols = ['參考文件號碼', '項目', '物料', '工廠', '客戶', '銷售文件', 'sales_item', '以 PCLC 計', '數量', '過帳日期', 'BUn', '輸入日期']
-            df_sales_common = df_sales[common_cols].copy()
-            df_sales_common['以 PCLC 計'] = -df_sales_common['以 PCLC 計']
-            df_sales_common['數量'] = -df_sales_common['數量']
-            if not df_returns.empty:
-                df_returns_common = df_returns[common_cols].copy()
-                df_returns_common['以 PCLC 計'] = -df_returns_common['以 PCLC 計']
-                df_returns_common['數量'] = -df_returns_common['數量']
-            else:
-                df_returns_common = pd.DataFrame(columns=common_cols)
-
-            df_combined = pd.concat([df_sales_common, df_returns_common], ignore_index=True)
-
-            df_combined['銷售文件'] = pd.to_numeric(df_combined['銷售文件'], errors='coerce').fillna(0).astype(int)
-            df_zsdc['先前文件'] = pd.to_numeric(df_zsdc['先前文件'], errors='coerce').fillna(0).astype(int)
-            df_combined['參考文件號碼'] = pd.to_numeric(df_combined['參考文件號碼'], errors='coerce').fillna(0).astype(int)
-            df_combined['項目'] = pd.to_numeric(df_combined['項目'], errors='coerce').fillna(0).astype(int)
-            df_combined['key'] = df_combined['參考文件號碼'].astype(str) + '_' + df_combined['項目'].astype(str)
-            df_zsdc['文件'] = pd.to_numeric(df_zsdc['文件'], errors='coerce').fillna(0).astype(int)
-            df_zsdc['項目'] = pd.to_numeric(df_zsdc['項目'], errors='coerce').fillna(0).astype(int)
-            df_zsdc['key'] = df_zsdc['文件'].astype(str) + '_' + df_zsdc['項目'].astype(str)
-            df_zsdc = df_zsdc.drop_duplicates(subset='key', keep='first')
-
-            mapping_dict = df_zsdc.set_index('key')[['物料說明', '淨重']].to_dict(orient='index')
-            df_combined['品名'] = df_combined['key'].apply(lambda k: mapping_dict.get(k, {}).get('物料說明', ''))
-            df_combined['單位用銅'] = df_combined['key'].apply(lambda k: mapping_dict.get(k, {}).get('淨重', ''))
-
-            # 記住沒有 zsdc 對應的行（主要是銷貨退回），後續輸出前清空數值欄位
-            no_zsdc_mask = df_combined['單位用銅'] == ''
-
-            sales_doc_dict = df_zsdc.set_index('先前文件')['bill-to-name'].to_dict()
-            df_combined['客戶名稱'] = df_combined['銷售文件'].map(sales_doc_dict).fillna('')
-            contract_no_dict = df_zsdc.set_index('先前文件')['合約號碼'].to_dict()
-            purchase_order_dict = df_zsdc.set_index('先前文件')['採購單號碼'].to_dict()
-            df_combined['合約號碼'] = df_combined['銷售文件'].map(contract_no_dict).fillna('')
-            df_combined['採購單'] = df_combined['銷售文件'].map(purchase_order_dict).fillna('')
-
-            df_combined['單位用銅'] = pd.to_numeric(df_combined['單位用銅'], errors='coerce').fillna(0)
-            df_combined['銅量'] = df_combined['單位用銅'] * df_combined['數量']
-
-            if not df_contract.empty:
-                df_combined['合約號碼'] = df_combined['合約號碼'].astype(str)
-                df_contract['合約編號'] = df_contract['合約編號'].astype(str)
-                df_contract = df_contract.drop_duplicates(subset='合約編號', keep='first')
-                contract_mapping = df_contract.set_index('合約編號')[['產品部', '通路', '部門', '報價單號', '匯率', '業務', '報價銅價']].to_dict(orient='index')
-                df_combined['線種'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('產品部', ''))
-                df_combined['產品群'] = ''
-                df_combined['通路'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('通路', ''))
-                df_combined['課別'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('部門', ''))
-                df_combined['報價單號'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('報價單號', ''))
-                df_combined['匯率'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('匯率', ''))
-                df_combined['業務員'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('業務', ''))
-                df_combined['報價銅'] = df_combined['合約號碼'].apply(lambda k: contract_mapping.get(k, {}).get('報價銅價', ''))
-                df_combined['線種'] = df_combined['線種'].replace({'銅通信電纜': '通信', '光通信電纜': '通信'})
-                # 線種為空值時，依物料開頭判斷
-                empty_line_mask = df_combined['線種'] == ''
-                df_combined.loc[empty_line_mask & df_combined['物料'].astype(str).str.startswith('G'), '線種'] = '電力'
-                df_combined.loc[empty_line_mask & df_combined['物料'].astype(str).str.startswith('6'), '線種'] = '通信'
-                df_combined['通路'] = df_combined['通路'].replace({
-                    '電力': '經銷長約',
-                    '經銷專案-特定': '經銷專案',
-                    '電力專案': '專案',
-                    '電力專案-綠能': '專案',
-                    '經銷專案-產電': '經銷專案產電',
-                    '電力專案-產電': '經銷專案產電',
-                    '經銷專案-特開': '經銷專案',
-                    '經銷專案-新商模': '經銷專案',
-                    '經銷專案-綠能電力': '經銷專案',
-                    '經銷專案-類長約': '經銷專案',
-                    '電力專案-類長約': '經銷專案',
-                    '通信專案': '民間通信',
-                    '通信': '民間通信',
-                })
-                df_combined['報價銅'] = pd.to_numeric(df_combined['報價銅'], errors='coerce').fillna(0)
-                df_combined['報價銅成本'] = df_combined['報價銅'] * df_combined['銅量']
-
-            if not df_product.empty:
-                df_combined['物料'] = df_combined['物料'].astype(str)
-                df_product['料號'] = df_product['料號'].astype(str)
-                df_product = df_product.drop_duplicates(subset='料號', keep='first')
-                product_mapping = df_product.set_index('料號')['產品群'].to_dict()
-                df_combined['產品群'] = df_combined['物料'].map(product_mapping).fillna('')
-                # 品名為空時（如銷貨退回），從產品群檔案補品名
-                if '品名' in df_product.columns:
-                    product_name_mapping = df_product.set_index('料號')['品名'].to_dict()
-                    empty_mask = df_combined['品名'] == ''
-                    df_combined.loc[empty_mask, '品名'] = df_combined.loc[empty_mask, '物料'].map(product_name_mapping).fillna('')
+    stream_mode = st.checkbox("大檔串流模式（逐批讀取銷貨檔，讀取時即篩掉日期區間外的資料）", key="d_stream")
+    save_to_ledger = st.checkbox("結果寫入累積帳本（同一筆 Billing 號 + 項目以最新結果取代）", key="d_ledger")
+    daily_format = st.radio("下載格式", list(FORMATS), format_func=lambda f: FORMATS[f]['label'], horizontal=True, key="d_format")
 
-            # 分類邏輯
-            df_combined['分類'] = ''
-            mask = df_combined['分類'] == ''
-
-            def classify_purchase_order(po, current_month):
-                if isinstance(po, str) and '-1=Y' in po:
-                    parts = po.split(' ')
-                    if len(parts) > 1:
-                        mm_part = parts[1].split('-1=')[0]
-                        try:
-                            mm = int(mm_part)
-                            if mm == current_month:
-                                return "經銷長約(M-1)"
-                            else:
-                                return "經銷長約(M-2)"
-                        except ValueError:
-                            pass
-                return ''
-
-            df_combined.loc[mask, '分類'] = df_combined.loc[mask, '採購單'].apply(classify_purchase_order, args=(month,))
-            mask = df_combined['分類'] == ''
-            df_combined.loc[mask & (df_combined['銅量'] == 0), '分類'] = '無'
-            mask = df_combined['分類'] == ''
-            民電_mask = mask & ((df_combined['課別'] == '民電業務部/營業一課') | (df_combined['課別'] == '民電業務部/營業三課'))
-            df_combined.loc[民電_mask & (df_combined['線種'] == '通信'), '分類'] = '通信'
-            df_combined.loc[民電_mask & (df_combined['線種'] != '通信'), '分類'] = '民電'
-            mask = df_combined['分類'] == ''
-            公電_mask = mask & ((df_combined['課別'] == '公電業務部/營業一課') | (df_combined['課別'] == '公電業務部/營業二課'))
-            df_combined.loc[公電_mask & (df_combined['工廠'].str.strip() == 'SCDM'), '分類'] = '無'
-            df_combined.loc[公電_mask & (df_combined['工廠'].str.strip() != 'SCDM') & (df_combined['線種'] == '通信'), '分類'] = '通信'
-            df_combined.loc[公電_mask & (df_combined['工廠'].str.strip() != 'SCDM') & (df_combined['線種'] != '通信'), '分類'] = '公電'
-            mask = df_combined['分類'] == ''
-            df_combined.loc[mask & ((df_combined['課別'].str[:2] == '產業') | (df_combined['課別'].str[:2] == '國際')), '分類'] = '外銷'
-            mask = df_combined['分類'] == ''
-            df_combined.loc[mask & (df_combined['線種'] == '通信'), '分類'] = '通信'
-
-            def extract_mm(po):
-                if isinstance(po, str) and '-1=Y' in po:
-                    po = po.replace(' ', '')
-                    if '-1=Y' in po:
-                        try:
-                            mm_part = po.split('-1=Y')[0][-2:]
-                            mm = int(mm_part)
-                            if 1 <= mm <= 12:
-                                return f"{mm:02d}"
-                        except ValueError:
-                            pass
-                return ''
-
-            mask_m2 = df_combined['分類'] == "經銷長約(M-2)"
-            df_combined.loc[mask_m2, '訂單月'] = df_combined.loc[mask_m2, '採購單'].apply(extract_mm)
-            df_combined['訂單月'] = pd.to_numeric(df_combined['訂單月'], errors='coerce')
-
-            df_combined['報價銅'] = pd.to_numeric(df_combined.get('報價銅', 0), errors='coerce').fillna(0)
-            df_combined['報價銅成本'] = df_combined['報價銅'] * df_combined['銅量']
-
-            # 沒有 zsdc 對應的行（如銷貨退回），數值欄位清為空值，產品群和品名保留
-            df_combined.loc[no_zsdc_mask, '單位用銅'] = None
-            df_combined.loc[no_zsdc_mask, '銅量'] = None
-            df_combined.loc[no_zsdc_mask, '報價銅'] = None
-            df_combined.loc[no_zsdc_mask, '報價銅成本'] = None
-            df_combined.loc[no_zsdc_mask, '匯率'] = None
-            df_combined.loc[no_zsdc_mask, '分類'] = ''
+    if st.button("處理檔案", key="btn_daily") and sales_file and (zsdc_file or reference_source == 'store'):
+        try:
+            # 主檔來源為參考資料庫時 zsdc_file 為 None，每批只從參考資料庫查出用得到的主檔資料
+            refs = engine.daily_references(zsdc_file, contract_file, product_file, read=read_upload)
+            df_output = engine.run_daily(sales_file, returns_file, refs, month, [(start_date, end_date)], stream=stream_mode, read=read_upload, as_of=store_as_of)
+            st.session_state.results['daily'] = (datetime.datetime.now().isoformat(), df_output)
 
-            df_combined = df_combined.rename(columns={
-                '參考文件號碼': '文件(Billing號)',
-                '項目': 'billing項目',
-                'sales_item': '銷售項目',
-            })
-            df_combined['過帳日期'] = pd.to_datetime(df_combined['過帳日期'], errors='coerce').dt.strftime('%Y/%m/%d')
-            output_cols = ['文件(Billing號)', '物料', '品名', '產品群', '工廠', '線種', '課別', '通路', '客戶', '客戶名稱', '銷售文件', '銷售項目', 'billing項目', '以 PCLC 計', '數量', '過帳日期', 'BUn', '單位用銅', '銅量', '合約號碼', '採購單', '分類', '訂單月', '報價銅', '報價銅成本', '匯率', '報價單號', '業務員']
-            for col in output_cols:
-                if col not in df_combined.columns:
-                    df_combined[col] = ''
-            df_output = df_combined[output_cols]
+            if save_to_ledger:
+                written, duplicated = ledger.upsert(df_output)
+                st.success(f"已寫入累積帳本 {written} 筆")
+                if duplicated:
+                    st.warning(f"有 {duplicated} 筆的 文件(Billing號) / billing項目 重複，只寫入最後一筆")
 
             st.write("處理結果預覽（前10行）：")
             st.dataframe(df_output.head(10))
-            output = BytesIO()
-            df_output.to_excel(output, index=False)
-            output.seek(0)
             st.download_button(
-                label="下載結果 Excel",
-                data=output,
-                file_name="mapped_report.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                label=f"下載結果 {FORMATS[daily_format]['name']}",
+                data=export(df_output, daily_format),
+                file_name=f"mapped_report.{daily_format}",
+                mime=FORMATS[daily_format]['mime'],
                 key="dl_daily"
             )
         except Exception as e:
             st.error(f"錯誤：{str(e)}。請檢查檔案格式是否正確。")
 
+    with st.expander("參考資料庫維護"):
+        st.caption("上傳完整主檔或只含異動的部分，只會寫入新增或內容有變動的資料，並記錄匯入日期。")
+        store_files = {
+            'zsdc': st.file_uploader("zsdc", type="xlsx", key="s_zsdc"),
+            'contract': st.file_uploader("合約管理", type="xlsx", key="s_contract"),
+            'product': st.file_uploader("產品群", type="xlsx", key="s_product"),
+            'quote': st.file_uploader("報價資訊", type="xlsx", key="s_quote"),
+        }
+        loaded_on = st.date_input("資料日期", value=datetime.datetime.now().date(), key="s_date")
+        if st.button("匯入參考資料庫", key="btn_store"):
+            try:
+                for name, file in store_files.items():
+                    if file:
+                        inserted, updated = refstore.upsert(name, read_upload(file, name), loaded_on=loaded_on)
+                        st.write(f"{file.name}：新增 {inserted} 筆，更新 {updated} 筆")
+            except Exception as e:
+                st.error(f"錯誤：{str(e)}。請檢查檔案格式是否正確。")
+        if os.path.exists(refstore.DEFAULT_PATH):
+            st.dataframe(refstore.load_log())
+
 # ===== 月底作業 =====
 with tab_monthly:
     st.subheader("月底作業")
     st.caption("上傳堆疊好的累積檔案 + 報價資訊，只覆寫報價銅、匯率及 M-1/M-2 銅價，不會動到你手動調整過的內容。")
 
-    accumulated_file = st.file_uploader("上傳堆疊好的累積檔案", type="xlsx", key="m_accumulated")
+    monthly_source = st.radio("資料來源", ['upload', 'ledger'], format_func=lambda f: {'upload': '上傳累積檔案', 'ledger': '累積帳本'}[f], horizontal=True, key="m_source")
+    if monthly_source == 'upload':
+        accumulated_file = st.file_uploader("上傳堆疊好的累積檔案", type="xlsx", key="m_accumulated")
+        patch_mode = st.checkbox("直接改寫原檔（保留其他分頁、隱藏列、格式及圖表，只改寫受影響列的報價銅、匯率、報價銅成本，輸出固定為 xlsx）", key="m_patch")
+    else:
+        accumulated_file = None
+        patch_mode = False
     quote_file = st.file_uploader("報價資訊", type="xlsx", key="m_quote")
+    use_stored_quote = st.checkbox("未上傳報價資訊時，使用參考資料庫的報價資訊", key="m_quote_store")
 
     m1_col0, m1_col1, m1_col2 = st.columns(3)
     with m1_col0:
@@ -275,68 +141,112 @@ with tab_monthly:
         m2_dict[group['month']] = group['price']
         m2_rate_dict[group['month']] = group['rate']
 
-    if st.button("處理檔案（月底）", key="btn_monthly") and accumulated_file:
-        try:
-            # 讀取累積檔案的 data實績 分頁（前兩行為隱藏行，第三行為標題）
-            df = pd.read_excel(accumulated_file, sheet_name='data實績', header=2)
-            df.columns = [str(c).strip() if pd.notna(c) else f'col_{j}' for j, c in enumerate(df.columns)]
-            df = df.dropna(how='all').reset_index(drop=True)
-
-            # 訂單月：如果檔案沒有，從採購單解析
-            if '訂單月' not in df.columns:
-                def extract_mm(po):
-                    if isinstance(po, str) and '-1=Y' in po:
-                        po = po.replace(' ', '')
-                        if '-1=Y' in po:
-                            try:
-                                mm_part = po.split('-1=Y')[0][-2:]
-                                mm = int(mm_part)
-                                if 1 <= mm <= 12:
-                                    return mm
-                            except ValueError:
-                                pass
-                    return None
-                df['訂單月'] = df.loc[df['分類'] == "經銷長約(M-2)", '採購單'].apply(extract_mm)
-
-            # 報價資訊覆寫報價銅和匯率（有對到才覆寫）
-            if quote_file:
-                df_quote = pd.read_excel(quote_file, sheet_name='qry_Temp')
-                df_quote['合約編號'] = df_quote['合約編號'].astype(str)
-                df['合約號碼'] = df['合約號碼'].astype(str)
-                df_quote = df_quote.drop_duplicates(subset='合約編號', keep='first')
-                quote_mapping = df_quote.set_index('合約編號')[['銅價+銅價調整', '匯率']].to_dict(orient='index')
-
-                quote_copper = df['合約號碼'].apply(lambda k: quote_mapping.get(k, {}).get('銅價+銅價調整', None))
-                quote_rate = df['合約號碼'].apply(lambda k: quote_mapping.get(k, {}).get('匯率', None))
-                df['報價銅'] = quote_copper.where(quote_copper.notna(), df['報價銅'])
-                df['匯率'] = quote_rate.where(quote_rate.notna(), df['匯率'])
-
-            # M-1/M-2 銅價及匯率覆寫
-            df['報價銅'] = pd.to_numeric(df['報價銅'], errors='coerce').fillna(0)
-            df['銅量'] = pd.to_numeric(df['銅量'], errors='coerce').fillna(0)
-            df['訂單月'] = pd.to_numeric(df.get('訂單月', pd.Series(dtype='float64')), errors='coerce')
+    monthly_format = st.radio("下載格式", list(FORMATS), format_func=lambda f: FORMATS[f]['label'], horizontal=True, key="m_format")
 
-            df.loc[df['分類'] == "經銷長約(M-1)", '報價銅'] = m1_copper_price
-            df.loc[df['分類'] == "經銷長約(M-1)", '匯率'] = m1_exchange_rate
-            mask_m2 = df['分類'] == "經銷長約(M-2)"
-            df.loc[mask_m2, '報價銅'] = df.loc[mask_m2, '訂單月'].map(m2_dict).fillna(df.loc[mask_m2, '報價銅'])
-            df.loc[mask_m2, '匯率'] = df.loc[mask_m2, '訂單月'].map(m2_rate_dict).fillna(df.loc[mask_m2, '匯率'])
-
-            # 重新計算報價銅成本
-            df['報價銅'] = pd.to_numeric(df['報價銅'], errors='coerce').fillna(0)
-            df['報價銅成本'] = df['報價銅'] * df['銅量']
+    if st.button("處理檔案（月底）", key="btn_monthly") and (accumulated_file or monthly_source == 'ledger'):
+        try:
+            df_quote = engine.load_quote(quote_file, use_stored_quote, read=read_upload)
+
+            fmt = 'xlsx' if patch_mode else monthly_format
+            # 累積帳本模式時 accumulated_file 為 None，直接在帳本上覆寫受影響的列
+            df, output, count = engine.run_monthly(accumulated_file, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, patch=patch_mode, read=read_upload)
+            st.session_state.results['monthly'] = (datetime.datetime.now().isoformat(), df)
+            if patch_mode:
+                st.success(f"已改寫 {count} 個儲存格")
+            else:
+                output = export(df, fmt)
 
             st.write("處理結果預覽（前10行）：")
             st.dataframe(df.head(10))
-            output = BytesIO()
-            df.to_excel(output, index=False)
-            output.seek(0)
             st.download_button(
-                label="下載結果 Excel（月底）",
+                label=f"下載結果 {FORMATS[fmt]['name']}（月底）",
                 data=output,
-                file_name="mapped_report_final.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                file_name=f"mapped_report_final.{fmt}",
+                mime=FORMATS[fmt]['mime'],
                 key="dl_monthly"
             )
         except Exception as e:
             st.error(f"錯誤：{str(e)}。請檢查檔案格式是否正確。")
+
+    with st.expander("手動修正（累積帳本）"):
+        st.caption("修正會另外保存，重新匯入每日結果或月底重算都不會蓋掉；值留空則取消該欄位的修正。")
+        o_col1, o_col2, o_col3, o_col4 = st.columns(4)
+        with o_col1:
+            o_doc = st.number_input("文件(Billing號)", min_value=0, step=1, key="o_doc")
+        with o_col2:
+            o_item = st.number_input("billing項目", min_value=0, step=1, key="o_item")
+        with o_col3:
+            o_col = st.selectbox("欄位", [c for c in OUTPUT_COLS if c not in ledger.KEY_COLS + ledger.DERIVED_COLS], key="o_col")
+        with o_col4:
+            o_value = st.text_input("修正值", key="o_value")
+        if st.button("儲存修正", key="btn_override"):
+            try:
+                value = o_value.strip() or None
+                if value is not None:
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        pass
+                ledger.set_override(o_doc, o_item, o_col, value)
+                st.success("已儲存修正")
+            except Exception as e:
+                st.error(f"錯誤：{str(e)}")
+        if os.path.exists(ledger.DEFAULT_PATH):
+            st.dataframe(ledger.load_overrides())
+
+# ===== 分析 =====
+with tab_dashboard:
+    st.subheader("銅量 / 銷售分析")
+    st.caption("依分類、線種、通路、課別及過帳日期預先加總，每份資料只算一次，切換篩選時不會重新掃描明細。")
+
+    sources = {}
+    if 'daily' in st.session_state.results:
+        sources['daily'] = '最近一次每日結果'
+    if 'monthly' in st.session_state.results:
+        sources['monthly'] = '最近一次月底結果'
+    if os.path.exists(ledger.DEFAULT_PATH):
+        sources['ledger'] = '累積帳本'
+
+    if not sources:
+        st.info("請先在每日或月底作業處理檔案，或將結果寫入累積帳本。")
+    else:
+        source = st.radio("資料來源", list(sources), format_func=sources.get, horizontal=True, key="a_source")
+        if source == 'ledger':
+            # 帳本檔案有異動（寫入、月底覆寫、手動修正）時才重新讀取
+            cube = dashboard.cached_cube(f"ledger-{os.path.getmtime(ledger.DEFAULT_PATH)}", ledger.load)
+        else:
+            created_at, df_result = st.session_state.results[source]
+            cube = dashboard.cached_cube(f"{source}-{created_at}", lambda: df_result)
+
+        filters = {}
+        for col, column in zip(dashboard.DIMENSIONS, st.columns(len(dashboard.DIMENSIONS))):
+            with column:
+                filters[col] = st.multiselect(col, list(cube[col].cat.categories), key=f"a_filter_{col}")
+        dates = cube[dashboard.DATE_COL].dropna()
+        if dates.empty:
+            start_date = end_date = None
+        else:
+            date_range = st.date_input("過帳日期", value=(dates.min().date(), dates.max().date()), key="a_dates")
+            start_date = date_range[0] if len(date_range) > 0 else None
+            end_date = date_range[1] if len(date_range) > 1 else None
+        filtered = dashboard.filter_cube(cube, filters, start_date, end_date)
+
+        for measure, column in zip(dashboard.MEASURES, st.columns(len(dashboard.MEASURES))):
+            with column:
+                st.metric(measure, f"{filtered[measure].sum():,.0f}")
+
+        a_col1, a_col2 = st.columns(2)
+        with a_col1:
+            measure = st.radio("指標", dashboard.MEASURES, horizontal=True, key="a_measure")
+        with a_col2:
+            dimension = st.radio("拆分", dashboard.DIMENSIONS, horizontal=True, key="a_dimension")
+
+        if filtered.empty:
+            st.info("沒有符合篩選條件的資料。")
+        else:
+            table = dashboard.breakdown(filtered, dimension, measure)
+            st.plotly_chart(dashboard.bar_chart(table, dimension, measure), key="a_bar")
+            series, label = dashboard.time_series(filtered, dimension, measure)
+            if not series.empty:
+                st.plotly_chart(dashboard.line_chart(series, dimension, measure, label), key="a_line")
+            st.dataframe(table)
@@ -0,0 +1,42 @@
+"""比較每日 mapping 結果 compact 前後的記憶體用量：python bench/dtype_memory.py [列數]"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema  # noqa: E402
+import synthetic  # noqa: E402
+from daily import combine, map_combined, prepare_references  # noqa: E402
+from monthly import apply_month_end  # noqa: E402
+
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def _report(label, wide, df):
+    before, after = _mb(wide), _mb(df)
+    print(f"{label}: {before:,.1f} MB -> {after:,.1f} MB（{after / before:.0%}）")
+    for col in df.columns:
+        b, a = wide[col].memory_usage(deep=True) / 1024 ** 2, df[col].memory_usage(deep=True) / 1024 ** 2
+        if a < b:
+            print(f"  {col}: {b:,.1f} -> {a:,.1f} MB（{df[col].dtype}）")
+
+
+def main(n=1_000_000):
+    data = synthetic.inputs(n)
+    refs = prepare_references(data['zsdc'], data['contract'], data['product'])
+    df_output = map_combined(combine(data['sales'].copy(), data['returns'].copy()), refs, 10)
+    # 對照組：expand 轉回一般型別的同一份結果（文字欄位為 object，與匯出前的型別相同）
+    df_wide = schema.expand(df_output)
+    print(f"{len(df_output):,} 列")
+    _report('每日 mapping 結果', df_wide, df_output)
+
+    month_end = (data['quote'], 305.0, 30.12, {9: 298.0}, {9: 29.85})
+    df = apply_month_end(df_output.copy(), *month_end)
+    df_wide = apply_month_end(df_wide.copy(), *month_end)
+    _report('月底覆寫結果', df_wide, schema.compact(df))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,201 @@
+"""各階段效能測試：產生模擬輸入檔，量測每個階段的時間及尖峰記憶體，結果寫成 JSON
+
+python bench/run.py [--rows 10000 100000 1000000] [-o bench_results.json] [--baseline 舊結果.json]
+
+時間與記憶體分開量：每個階段先量時間，再開 tracemalloc 重跑一次量尖峰記憶體
+（numpy / pandas 的陣列都算在內，pyarrow 的記憶體不算）；--no-memory 只量時間
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from classify import classify  # noqa: E402
+from daily import combine, filter_input_dates, map_combined, prepare_references  # noqa: E402
+from export import FORMATS, export  # noqa: E402
+from ingest import ENGINES, iter_batches, load_input  # noqa: E402
+from lookup import composite_key, lookup, to_int  # noqa: E402
+from monthly import apply_month_end, prepare_accumulated  # noqa: E402
+
+MONTH = 10
+START_DATE, END_DATE = datetime.date(2026, MONTH, 1), datetime.date(2026, MONTH, 28)
+M1_COPPER_PRICE, M1_EXCHANGE_RATE = 305.0, 30.12
+M2_DICT, M2_RATE_DICT = {m: 298.0 + m for m in range(1, MONTH)}, {m: 29.85 for m in range(1, MONTH)}
+# 超過這個列數就不測串流讀取（openpyxl 逐列讀取太慢）
+STREAM_MAX_ROWS = 1_000_000
+
+
+class Timer:
+    """量測一個階段的時間及尖峰記憶體
+
+    時間與記憶體分兩次執行量測：tracemalloc 會讓純 Python 的部分慢好幾倍，開著量時間不準
+    """
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.results = []
+
+    def run(self, rows, stage, func, *args, memory=True):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+
+        peak = None
+        if memory and self.memory:
+            tracemalloc.start()
+            try:
+                func(*args)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        record = {
+            'rows': rows,
+            'stage': stage,
+            'seconds': round(seconds, 4),
+            'peak_mb': round(peak / 1024 ** 2, 2) if peak is not None else None,
+            'out_rows': len(result) if isinstance(result, (pd.DataFrame, pd.Series)) else None,
+        }
+        self.results.append(record)
+        peak_text = f"{record['peak_mb']:>9,.1f} MB" if peak is not None else ''
+        print(f"{rows:>10,} {stage:<18} {seconds:>9.3f} s {peak_text}", flush=True)
+        return result
+
+
+def _read_all(paths):
+    return {name: load_input(paths[name], name) for name in ['sales', 'returns', 'zsdc', 'contract', 'product', 'quote']}
+
+
+def _read_stream(path):
+    # 只有串流讀取本身，不做 mapping
+    return sum(len(df) for df in iter_batches(path, 'sales'))
+
+
+def _key_build(df_combined, frames):
+    refs = prepare_references(frames['zsdc'].copy(), frames['contract'].copy(), frames['product'].copy())
+    keys = {
+        'item': composite_key(to_int(df_combined['參考文件號碼']), to_int(df_combined['項目'])),
+        'doc': to_int(df_combined['銷售文件']),
+        'material': df_combined['物料'].astype(str),
+    }
+    return refs, keys
+
+
+def _lookup_zsdc(keys, refs):
+    return lookup(keys['item'], refs['zsdc_item']), lookup(keys['doc'], refs['zsdc_doc'])
+
+
+def _lookup_contract(zsdc_doc, refs):
+    return lookup(zsdc_doc['合約號碼'].fillna('').astype(str), refs['contract'])
+
+
+def _month_end(df_accumulated, df_quote):
+    df = prepare_accumulated(df_accumulated.copy())
+    return apply_month_end(df, df_quote.copy(), M1_COPPER_PRICE, M1_EXCHANGE_RATE, M2_DICT, M2_RATE_DICT)
+
+
+def bench(rows, workdir, timer, seed=0):
+    # 已產生過的輸入檔直接沿用，generate 的時間只在第一次有意義（不量記憶體，以免再寫一次檔）
+    paths = timer.run(rows, 'generate', synthetic.write_workbooks, os.path.join(workdir, f'rows{rows}_seed{seed}_v{synthetic.VERSION}'), rows, seed, MONTH, memory=False)
+
+    frames = timer.run(rows, 'read', _read_all, paths)
+    df_accumulated = timer.run(rows, 'read_accumulated', load_input, paths['accumulated'], 'accumulated')
+    if rows <= STREAM_MAX_ROWS:
+        timer.run(rows, 'read_stream', _read_stream, paths['sales'])
+
+    df_sales = filter_input_dates(frames['sales'].copy(), START_DATE, END_DATE)
+    df_returns = filter_input_dates(frames['returns'].copy(), START_DATE, END_DATE)
+    df_combined = timer.run(rows, 'combine', combine, df_sales, df_returns)
+
+    refs, keys = timer.run(rows, 'key_build', _key_build, df_combined, frames)
+    _, zsdc_doc = timer.run(rows, 'lookup_zsdc', _lookup_zsdc, keys, refs)
+    timer.run(rows, 'lookup_contract', _lookup_contract, zsdc_doc, refs)
+    timer.run(rows, 'lookup_product', lookup, keys['material'], refs['product'])
+
+    # 完整的每日 mapping（含上面各步驟），再單獨量分類
+    # map_combined 會改動傳入的 DataFrame，每次執行都給一份新的
+    df_output = timer.run(rows, 'map', lambda: map_combined(df_combined.copy(), refs, MONTH))
+    timer.run(rows, 'classify', classify, df_output, MONTH)
+
+    timer.run(rows, 'month_end', _month_end, df_accumulated, frames['quote'])
+    for fmt in FORMATS:
+        timer.run(rows, f'export_{fmt}', lambda f: export(df_output, f).getbuffer().nbytes, fmt)
+
+
+def _git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(['git', '-C', root, 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """與之前的結果比較，列出時間變慢超過 threshold 倍的階段，回傳變慢的階段數"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['rows'], r['stage']): r for r in json.load(f)['results']}
+    slower = 0
+    for r in results:
+        old = baseline.get((r['rows'], r['stage']))
+        if old is None or r['stage'] == 'generate' or not old['seconds']:
+            continue
+        ratio = r['seconds'] / old['seconds']
+        flag = '  <-- 變慢' if ratio > threshold else ''
+        slower += bool(flag)
+        print(f"{r['rows']:>10,} {r['stage']:<18} {old['seconds']:>9.3f} s -> {r['seconds']:>9.3f} s ({ratio:.2f}x){flag}")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="銷售日報表 mapping 各階段效能測試")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000], help="銷貨收入列數（可多個）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=os.path.join('bench', 'data'), help="模擬輸入檔存放位置（已產生的會沿用）")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="結果 JSON")
+    parser.add_argument('--no-memory', action='store_true', help="只量時間（每個階段只跑一次）")
+    parser.add_argument('--baseline', help="與之前的結果 JSON 比較")
+    parser.add_argument('--threshold', type=float, default=1.2, help="時間超過 baseline 幾倍算變慢")
+    args = parser.parse_args(argv)
+
+    timer = Timer(memory=not args.no_memory)
+    print(f"{'rows':>10} {'stage':<18} {'time':>11} {'peak':>12}")
+    for rows in args.rows:
+        bench(rows, args.workdir, timer, args.seed)
+
+    report = {
+        'meta': {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'engines': ENGINES,
+            'formats': list(FORMATS),
+            'memory': timer.memory,
+            'seed': args.seed,
+        },
+        'results': timer.results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {args.output}")
+
+    if args.baseline:
+        return 1 if compare(timer.results, args.baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
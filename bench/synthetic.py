@@ -0,0 +1,234 @@
+"""產生模擬的輸入資料及 xlsx 檔（銷貨收入 / 銷貨退回 / zsdc / 合約管理 / 產品群 / 報價資訊 / 累積檔），欄位與實際檔案相同
+
+python bench/synthetic.py 資料夾 [列數]：寫出一組可直接給 cli.py 使用的輸入檔
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classify import M1, M2  # noqa: E402
+from daily import OUTPUT_COLS  # noqa: E402
+from ingest import INPUTS  # noqa: E402
+
+PLANTS = ['SCDM', 'SCT1', 'SCT2', 'SCK1']
+DEPARTMENTS = ['民電業務部/營業一課', '民電業務部/營業三課', '公電業務部/營業一課', '公電業務部/營業二課', '產業一課', '國際業務部', '電力專案部']
+PRODUCT_DIVISIONS = ['電力', '銅通信電纜', '光通信電纜', '']
+CHANNELS = ['電力', '經銷專案-特定', '電力專案', '經銷專案-產電', '通信專案', '通信', '電力專案-綠能']
+MATERIAL_PREFIXES = ['G', '6', 'X', 'P']
+FIRST_DOC = 9_100_000_000
+FIRST_SALES_DOC = 20_000_000
+ITEMS = np.array([10, 20, 30, 40, 50])
+# 產生方式改變時加一，bench/run.py 以此區分已產生的檔案
+VERSION = 2
+
+
+def _doc_items(rng, n):
+    # (文件, 項目) 不重複：每張文件最多 len(ITEMS) 個項目，從 文件數 × 項目數 個位置中不重複抽 n 個；回傳 (文件序號, 項目, 文件數)
+    n_docs = max(n // 4, -(-n // len(ITEMS)))
+    slots = rng.choice(n_docs * len(ITEMS), n, replace=False)
+    return slots // len(ITEMS), ITEMS[slots % len(ITEMS)], n_docs
+
+
+def _purchase_orders(rng, n, month):
+    # 約三成為長約 'MM-1=Y'（當月 / 前幾個月），其餘為一般採購單號
+    months = rng.integers(max(month - 3, 1), month + 1, n)
+    long_term = [f'PO {m:02d}-1=Y' for m in months]
+    plain = [f'PO{x}' for x in rng.integers(100000, 999999, n)]
+    return np.where(rng.random(n) < 0.3, long_term, plain)
+
+
+def inputs(n, seed=0, month=10, returns_ratio=0.05):
+    """產生 n 列銷貨收入及對應的主檔，回傳 dict（sales / returns / zsdc / contract / product / quote）
+
+    zsdc 約涵蓋 97% 的銷貨明細、合約號碼約 90% 對得到合約管理，與實際檔案的比例相近
+    """
+    rng = np.random.default_rng(seed)
+    doc_numbers, items, n_docs = _doc_items(rng, n)
+    n_contracts = max(n // 200, 10)
+    n_materials = max(n // 100, 20)
+    n_orders = max(n // 3, 1)
+
+    contracts = np.array([f'K{i:07d}' for i in range(n_contracts)])
+    materials = np.array([f'{MATERIAL_PREFIXES[i % len(MATERIAL_PREFIXES)]}{i:06d}' for i in range(n_materials)])
+    customers = rng.integers(100000, 100000 + max(n // 50, 10), n_orders)
+
+    docs = FIRST_DOC + doc_numbers
+    orders = rng.integers(0, n_orders, n)
+    dates = pd.Timestamp(2026, month, 1) + pd.to_timedelta(rng.integers(0, 28, n), 'D')
+    sales = pd.DataFrame({
+        '參考文件號碼': docs,
+        '項目': items,
+        '物料': materials[rng.integers(0, n_materials, n)],
+        '工廠': rng.choice(PLANTS, n, p=[0.4, 0.3, 0.2, 0.1]),
+        '客戶': customers[orders],
+        '銷售文件': FIRST_SALES_DOC + orders,
+        '項目.1': items,
+        '以 PCLC 計': rng.normal(50_000, 20_000, n).round(0),
+        '數量': rng.integers(1, 5_000, n).astype('float64'),
+        '過帳日期': dates,
+        'BUn': rng.choice(['M', 'KG', 'EA'], n, p=[0.8, 0.15, 0.05]),
+        '輸入日期': dates,
+    })
+
+    n_returns = int(n * returns_ratio)
+    # 退回的文件號碼加上 n_docs，不會與銷貨收入重複
+    returns = sales.sample(n_returns, random_state=seed).reset_index(drop=True)
+    returns['參考文件號碼'] = returns['參考文件號碼'] + n_docs
+
+    # zsdc：以 文件 + 項目 為 key，少部分銷貨明細對不到
+    keys = sales[['參考文件號碼', '項目']].drop_duplicates()
+    keys = keys[rng.random(len(keys)) < 0.97]
+    m = len(keys)
+    order_of_key = sales.loc[keys.index, '銷售文件'].to_numpy()
+    zsdc = pd.DataFrame({
+        '文件': keys['參考文件號碼'].to_numpy(),
+        '項目': keys['項目'].to_numpy(),
+        '先前文件': order_of_key,
+        '物料說明': sales.loc[keys.index, '物料'].to_numpy().astype(object) + ' 電纜',
+        '淨重': rng.gamma(2.0, 0.8, m).round(3),
+        'bill-to-name': np.array([f'客戶{c}' for c in sales.loc[keys.index, '客戶']], dtype=object),
+        '合約號碼': np.where(rng.random(m) < 0.9, contracts[rng.integers(0, n_contracts, m)], ''),
+        '採購單號碼': _purchase_orders(rng, m, month),
+    })
+
+    contract = pd.DataFrame({
+        '合約編號': contracts,
+        '產品部': rng.choice(PRODUCT_DIVISIONS, n_contracts, p=[0.5, 0.2, 0.1, 0.2]),
+        '通路': rng.choice(CHANNELS, n_contracts),
+        '部門': rng.choice(DEPARTMENTS, n_contracts),
+        '報價單號': [f'Q{i:07d}' for i in range(n_contracts)],
+        '匯率': rng.choice([1.0, 29.85, 30.12, 31.5], n_contracts),
+        '業務': [f'業務{i % 40:02d}' for i in range(n_contracts)],
+        '報價銅價': rng.normal(300, 15, n_contracts).round(1),
+    })
+
+    product = pd.DataFrame({
+        '料號': materials,
+        '產品群': [f'P{i % 30:02d}' for i in range(n_materials)],
+        '品名': [f'{m} 電纜' for m in materials],
+    })
+
+    quoted = contracts[rng.random(n_contracts) < 0.2]
+    quote = pd.DataFrame({
+        '合約編號': quoted,
+        '銅價+銅價調整': rng.normal(310, 10, len(quoted)).round(1),
+        '匯率': rng.choice([29.85, 30.12], len(quoted)),
+    })
+
+    return {'sales': sales, 'returns': returns, 'zsdc': zsdc, 'contract': contract, 'product': product, 'quote': quote}
+
+
+CATEGORIES = [M1, M2, '民電', '公電', '通信', '外銷', '無', '']
+CATEGORY_WEIGHTS = [0.15, 0.15, 0.2, 0.15, 0.15, 0.08, 0.07, 0.05]
+# 實際匯出檔還有許多用不到的欄位，讀取時只取需要的欄位
+FILLER_COLS = ['公司代碼', '幣別', '文件類型', '銷售組織']
+
+
+def accumulated(n, seed=0, month=10, contracts=None):
+    """產生 n 列累積檔 data實績 分頁的內容（欄位同每日輸出），M-1/M-2 各約一成五，採購單為 'PO MM-1=Y'"""
+    rng = np.random.default_rng(seed + 1)
+    if contracts is None:
+        contracts = np.array([f'K{i:07d}' for i in range(max(n // 200, 10))])
+    category = rng.choice(CATEGORIES, n, p=CATEGORY_WEIGHTS)
+    po_month = np.where(category == M1, month, rng.integers(max(month - 3, 1), month, n))
+    long_term = np.isin(category, [M1, M2])
+    copper = rng.gamma(2.0, 0.8, n).round(3) * rng.integers(1, 5_000, n)
+    price = rng.normal(300, 15, n).round(1)
+    df = pd.DataFrame({col: '' for col in OUTPUT_COLS}, index=range(n))
+    doc_numbers, items, _ = _doc_items(rng, n)
+    df['文件(Billing號)'] = FIRST_DOC + doc_numbers
+    df['billing項目'] = items
+    df['工廠'] = rng.choice(PLANTS, n)
+    df['課別'] = rng.choice(DEPARTMENTS, n)
+    df['線種'] = rng.choice(['電力', '通信'], n)
+    df['通路'] = rng.choice(['經銷長約', '經銷專案', '專案', '民間通信'], n)
+    df['以 PCLC 計'] = rng.normal(50_000, 20_000, n).round(0)
+    df['銅量'] = copper
+    df['合約號碼'] = contracts[rng.integers(0, len(contracts), n)]
+    df['採購單'] = np.where(long_term, [f'PO {m:02d}-1=Y' for m in po_month], 'PO123456')
+    df['分類'] = category
+    df['訂單月'] = np.where(category == M2, po_month, np.nan)
+    df['報價銅'] = price
+    df['報價銅成本'] = price * copper
+    df['匯率'] = rng.choice([29.85, 30.12], n)
+    return df
+
+
+def _writer(worksheet, s, date_format):
+    # 依欄位型別決定寫入方式，省去 xlsxwriter 逐格判斷型別；空值不寫（成為空白格）
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return lambda row, col, value: pd.notna(value) and worksheet.write_datetime(row, col, value.to_pydatetime(), date_format)
+    if pd.api.types.is_numeric_dtype(s):
+        return lambda row, col, value: value == value and worksheet.write_number(row, col, value)
+    return lambda row, col, value: value is not None and value == value and value != '' and worksheet.write(row, col, value)
+
+
+def write_sheet(path, sheet_name, df, hidden_rows=0, header=None):
+    """以 xlsxwriter constant_memory 寫出單一分頁；hidden_rows 為標題列上方的隱藏列數（累積檔為 2）"""
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+    date_format = workbook.add_format({'num_format': 'yyyy/mm/dd'})
+    worksheet = workbook.add_worksheet(sheet_name)
+    for i in range(hidden_rows):
+        worksheet.set_row(i, None, None, {'hidden': True})
+        worksheet.write(i, 0, f'（隱藏列 {i + 1}）')
+    worksheet.write_row(hidden_rows, 0, header or list(df.columns))
+    writers = [_writer(worksheet, df[c], date_format) for c in df.columns]
+    columns = [df[c].tolist() for c in df.columns]
+    for i, row in enumerate(zip(*columns), start=hidden_rows + 1):
+        for j, value in enumerate(row):
+            writers[j](i, j, value)
+    workbook.close()
+
+
+def _with_fillers(df, rng):
+    # 插入用不到的欄位，並還原重複的欄名（實際檔案兩個欄位都叫 '項目'，讀取後第二個才是 '項目.1'）
+    df = df.copy()
+    for j, col in enumerate(FILLER_COLS):
+        df.insert(min(2 * j + 1, len(df.columns)), col, rng.choice(['TW01', 'TWD', 'F2', '1000'], len(df)))
+    header = ['項目' if c == '項目.1' else c for c in df.columns]
+    return df, header
+
+
+FILE_NAMES = {
+    'sales': '41110000.xlsx',
+    'returns': '41700000.xlsx',
+    'zsdc': 'zsdc.xlsx',
+    'contract': '合約管理.xlsx',
+    'product': '產品群.xlsx',
+    'quote': '報價資訊.xlsx',
+    'accumulated': '累積檔.xlsx',
+}
+
+
+def write_workbooks(directory, n, seed=0, month=10):
+    """在 directory 寫出一組 n 列的輸入檔（檔名可被 cli.py 辨識），已存在時直接沿用；回傳 {種類: 路徑}"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, file_name) for name, file_name in FILE_NAMES.items()}
+    if all(os.path.exists(p) for p in paths.values()):
+        return paths
+
+    rng = np.random.default_rng(seed)
+    frames = inputs(n, seed, month)
+    frames['accumulated'] = accumulated(n, seed, month, frames['contract']['合約編號'].to_numpy())
+    for name, df in frames.items():
+        header = None
+        if name in ('sales', 'returns'):
+            df, header = _with_fillers(df, rng)
+        spec = INPUTS[name]
+        # 先寫暫存檔再改名，中斷時不會留下不完整的檔案
+        tmp = paths[name] + '.tmp'
+        write_sheet(tmp, spec['sheet_name'], df, spec.get('header', 0), header)
+        os.replace(tmp, paths[name])
+    return paths
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    for name, path in write_workbooks(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10_000).items():
+        print(f"{name}: {path}")
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+M1 = "經銷長約(M-1)"
+M2 = "經銷長約(M-2)"
+
+民電_課別 = ['民電業務部/營業一課', '民電業務部/營業三課']
+公電_課別 = ['公電業務部/營業一課', '公電業務部/營業二課']
+外銷_課別 = ['產業', '國際']
+
+# 採購單第二段（空白分隔）在 '-1=' 之前的數字，例如 'PO 09-1=Y' -> 9
+_PO_TOKEN_MM = r'^[^ ]* [^\S ]*([+-]?\d+(?:_\d+)*)[^\S ]*(?=-1=| |$)'
+# 去除空白後，第一個 '-1=Y' 前的兩個字元，例如 'PO0912-1=Y' -> '12'
+_PO_MM = r'^.*?(.{0,2})-1=Y'
+
+
+def _int_or_nan(text):
+    try:
+        return int(text)
+    except ValueError:
+        return np.nan
+
+
+def _to_number(mm):
+    # 與原本的 int() 一致，全形等 Unicode 數字也算（pd.to_numeric 不接受，只對這些值改用 int()）
+    num = pd.to_numeric(mm, errors='coerce')
+    retry = num.isna() & mm.notna()
+    if retry.any():
+        num = num.astype('float64')
+        num[retry] = mm[retry].map(_int_or_nan).astype('float64')
+    return num
+
+
+def _is_long_term(po):
+    return po.str.contains('-1=Y', regex=False).fillna(False).astype(bool)
+
+
+def po_token_month(po):
+    """分類用：採購單第二段的月份（不限 1~12），無法解析者為 NaN（非字串一律視為無法解析）"""
+    # object 型別走 Python re，\d 與 int() 一樣接受全形等 Unicode 數字（pyarrow 字串的 \d 只認 ASCII）
+    po = po.astype(str).astype(object)
+    mm = po.str.extract(_PO_TOKEN_MM, expand=False).str.replace('_', '', regex=False)
+    return _to_number(mm).where(_is_long_term(po))
+
+
+def order_month(po):
+    """訂單月：採購單 'MM-1=Y' 的 MM（1~12），每日及月底作業共用，無法解析者為 NaN"""
+    # object 型別走 Python re，\d 與 int() 一樣接受全形等 Unicode 數字（pyarrow 字串的 \d 只認 ASCII）
+    po = po.astype(str).astype(object)
+    mm = po.str.replace(' ', '', regex=False).str.extract(_PO_MM, expand=False)
+    mm = mm.where(mm.str.fullmatch(r'\s*[+-]?\d+\s*').fillna(False).astype(bool))
+    mm = _to_number(mm.str.strip())
+    return mm.where(mm.between(1, 12) & _is_long_term(po)).astype('float64')
+
+
+# 分類規則：依序比對，第一個成立的規則決定分類，皆不成立則為 ''
+RULES = [
+    (M1, lambda c: c['po_month'] == c['month']),
+    (M2, lambda c: c['po_month'].notna()),
+    ('無', lambda c: c['銅量'] == 0),
+    ('通信', lambda c: c['課別'].isin(民電_課別) & (c['線種'] == '通信')),
+    ('民電', lambda c: c['課別'].isin(民電_課別)),
+    ('無', lambda c: c['課別'].isin(公電_課別) & (c['工廠'] == 'SCDM')),
+    ('通信', lambda c: c['課別'].isin(公電_課別) & (c['線種'] == '通信')),
+    ('公電', lambda c: c['課別'].isin(公電_課別)),
+    ('外銷', lambda c: c['課別'].str[:2].isin(外銷_課別)),
+    ('通信', lambda c: c['線種'] == '通信'),
+]
+
+
+def compile_rules(rules):
+    """把規則表編成單一 np.select，回傳 (分類, 各列命中的規則編號)；未命中者編號為 len(rules)"""
+    labels = np.array([label for label, _ in rules] + [''], dtype=object)
+    conditions = [cond for _, cond in rules]
+
+    def apply(c):
+        conds = [np.asarray(cond(c), dtype=bool) for cond in conditions]
+        hit = np.select(conds, np.arange(len(conds)), default=len(conds))
+        return labels[hit], hit
+
+    return apply
+
+
+_apply_rules = compile_rules(RULES)
+_M2_RULES = [i for i, (label, _) in enumerate(RULES) if label == M2]
+
+
+def parse_purchase_order(po):
+    """採購單解析一次取得 分類用月份 及 訂單月；採購單重複率高，只解析不重複的值再展開回每一列"""
+    codes, uniques = pd.factorize(po, use_na_sentinel=False)
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = np.column_stack([
+        po_token_month(uniques).to_numpy(dtype='float64'),
+        order_month(uniques).to_numpy(dtype='float64'),
+    ])
+    return pd.DataFrame(parsed[codes], index=po.index, columns=['po_month', '訂單月'])
+
+
+def classify(df, month):
+    """依 RULES 一次算出 分類 及 訂單月（只有 經銷長約(M-2) 才有訂單月）"""
+    po = parse_purchase_order(df['採購單'])
+    c = {
+        'month': month,
+        'po_month': po['po_month'],
+        '銅量': df['銅量'],
+        # 轉成 category 後字串比對與 .str 操作只針對不重複值進行
+        '課別': df['課別'].astype('category'),
+        '線種': df['線種'].astype('category'),
+        '工廠': df['工廠'].astype('category').str.strip(),
+    }
+    labels, hit = _apply_rules(c)
+    category = pd.Series(labels, index=df.index, dtype=object)
+    return category, po['訂單月'].where(np.isin(hit, _M2_RULES))
@@ -0,0 +1,176 @@
+import argparse
+import datetime
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import engine
+import ledger
+import refstore
+from daily import prepare_references
+from export import FORMATS, export
+from ingest import load_input
+
+# 依檔名辨識輸入檔（檔名包含以下文字）；月底作業中其餘的 xlsx 都視為累積檔
+FILE_PATTERNS = {
+    'sales': '41110000',
+    'returns': '41700000',
+    'zsdc': 'zsdc',
+    'contract': '合約管理',
+    'product': '產品群',
+    'quote': '報價資訊',
+}
+
+
+def find_inputs(directory):
+    """列出資料夾內的 xlsx（略過 Excel 暫存檔 ~$），依 FILE_PATTERNS 分類，回傳 {種類: [路徑]}，未分類者放在 'other'"""
+    found = {name: [] for name in list(FILE_PATTERNS) + ['other']}
+    for path in sorted(Path(directory).glob('*.xlsx')):
+        if path.name.startswith('~$'):
+            continue
+        name = next((n for n, pattern in FILE_PATTERNS.items() if pattern.lower() in path.name.lower()), 'other')
+        found[name].append(path)
+    return found
+
+
+def parse_range(text):
+    """'2026-07-01:2026-07-31' 或單日 '2026-07-01' 轉成 (開始日期, 結束日期)"""
+    start, _, end = text.partition(':')
+    try:
+        start_date = datetime.date.fromisoformat(start)
+        end_date = datetime.date.fromisoformat(end) if end else start_date
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期區間格式錯誤：{text}（應為 YYYY-MM-DD:YYYY-MM-DD）")
+    if end_date < start_date:
+        raise argparse.ArgumentTypeError(f"結束日期早於開始日期：{text}")
+    return start_date, end_date
+
+
+def check_ranges(ranges):
+    # 區間重疊時同一列會被算兩次
+    ordered = sorted(ranges)
+    for (_, end_date), (start_date, _) in zip(ordered, ordered[1:]):
+        if start_date <= end_date:
+            raise ValueError(f"日期區間重疊：{start_date} ~ {end_date}")
+    return ordered
+
+
+def _concat_inputs(paths, name):
+    # 同一種主檔有多個檔案（例如各工廠分開匯出）時依檔名順序合併
+    frames = [load_input(path, name) for path in paths]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def daily(args):
+    found = find_inputs(args.input_dir)
+    workbooks = [('sales', p) for p in found['sales']] + [('returns', p) for p in found['returns']]
+    if not found['sales']:
+        raise ValueError(f"{args.input_dir} 內沒有 41110000 銷貨收入檔")
+    ranges = check_ranges(args.range)
+
+    if args.store:
+        refs = None
+    elif found['zsdc']:
+        refs = prepare_references(
+            _concat_inputs(found['zsdc'], 'zsdc'),
+            _concat_inputs(found['contract'], 'contract'),
+            _concat_inputs(found['product'], 'product'),
+        )
+    else:
+        raise ValueError(f"{args.input_dir} 內沒有 zsdc 檔（或加上 --store 使用參考資料庫）")
+
+    df_output = engine.run_daily_many(workbooks, refs, args.month, ranges, stream=args.stream, workers=args.workers, store_path=args.store_path, as_of=args.as_of)
+    output = Path(args.output or f"mapped_report.{args.format}")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(export(df_output, args.format).getvalue())
+    print(f"{len(workbooks)} 個檔案，{len(df_output)} 筆 -> {output}")
+    if args.ledger:
+        written, duplicated = ledger.upsert(df_output, args.ledger_path)
+        print(f"已寫入累積帳本 {written} 筆" + (f"（{duplicated} 筆的 key 重複，只寫入最後一筆）" if duplicated else ''))
+
+
+def monthly(args):
+    found = find_inputs(args.input_dir)
+    # 前一次輸出的 *_final 不算累積檔
+    accumulated = [p for p in found['other'] if not p.stem.endswith('_final')]
+    if not accumulated and not args.ledger:
+        raise ValueError(f"{args.input_dir} 內沒有累積檔（或加上 --ledger 直接覆寫累積帳本）")
+    if len(found['quote']) > 1:
+        raise ValueError(f"{args.input_dir} 內有多個報價資訊檔")
+    quote = found['quote'][0] if found['quote'] else None
+    df_quote = engine.load_quote(quote, args.quote_store, store_path=args.store_path, as_of=args.as_of)
+
+    m2_dict = {month: price for month, price, _ in args.m2}
+    m2_rate_dict = {month: rate for month, _, rate in args.m2}
+    output_dir = Path(args.output or '.')
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.ledger:
+        df, _, _ = engine.run_monthly(None, df_quote, args.m1[0], args.m1[1], m2_dict, m2_rate_dict, ledger_path=args.ledger_path)
+        output_path = output_dir / f"mapped_report_final.{args.format}"
+        output_path.write_bytes(export(df, args.format).getvalue())
+        print(f"累積帳本 {len(df)} 筆 -> {output_path}")
+        return
+
+    fmt = 'xlsx' if args.patch else args.format
+    jobs = [(path, output_dir / f"{path.stem}_final.{fmt}") for path in accumulated]
+    results = engine.run_monthly_many(jobs, df_quote, args.m1[0], args.m1[1], m2_dict, m2_rate_dict, fmt=fmt, patch=args.patch, workers=args.workers)
+    for (_, output_path), (rows, count) in zip(jobs, results):
+        print(f"{output_path}：{rows} 筆" + (f"，改寫 {count} 個儲存格" if args.patch else ''))
+
+
+def _m2(text):
+    try:
+        month, price, rate = text.split(':')
+        return int(month), float(price), float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"M-2 格式錯誤：{text}（應為 月份:銅價:匯率）")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="銷售日報表 mapping 批次作業（不經 Streamlit）")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('input_dir', help="輸入檔資料夾，依檔名辨識：" + "、".join(f"{p}（{n}）" for n, p in FILE_PATTERNS.items()))
+    common.add_argument('--workers', type=int, default=None, help="平行行程數（預設為 CPU 數）")
+    common.add_argument('--format', choices=list(FORMATS), default='xlsx', help="輸出格式")
+    common.add_argument('--store-path', default=refstore.DEFAULT_PATH, help="參考資料庫路徑")
+    common.add_argument('--ledger-path', default=ledger.DEFAULT_PATH, help="累積帳本路徑")
+    common.add_argument('--as-of', type=datetime.date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+                        help="參考資料庫查詢該匯入日期當時的版本（預設為最新）")
+
+    p_daily = sub.add_parser('daily', parents=[common], help="每日 mapping：資料夾內每個銷貨收入 / 退回檔平行處理，結果合併成一個檔")
+    p_daily.add_argument('--range', type=parse_range, action='append', required=True,
+                         help="輸入日期區間 YYYY-MM-DD:YYYY-MM-DD（或單日），可指定多次")
+    p_daily.add_argument('--month', type=int, default=datetime.date.today().month, help="設定月份（預設當月）")
+    p_daily.add_argument('--stream', action='store_true', help="串流模式逐批讀取銷貨檔")
+    p_daily.add_argument('--store', action='store_true', help="主檔從參考資料庫查，不讀資料夾內的 zsdc / 合約管理 / 產品群")
+    p_daily.add_argument('--ledger', action='store_true', help="結果寫入累積帳本")
+    p_daily.add_argument('-o', '--output', help="輸出檔（預設 mapped_report.<格式>）")
+    p_daily.set_defaults(func=daily)
+
+    p_monthly = sub.add_parser('monthly', parents=[common], help="月底作業：資料夾內每個累積檔平行覆寫，各自輸出 <檔名>_final")
+    p_monthly.add_argument('--m1', type=float, nargs=2, metavar=('銅價', '匯率'), default=(0.0, 0.0), help="M-1 銅價及匯率")
+    p_monthly.add_argument('--m2', type=_m2, action='append', default=[], help="M-2 月份:銅價:匯率，可指定多次")
+    p_monthly.add_argument('--ledger', action='store_true', help="直接在累積帳本上覆寫，不讀資料夾內的累積檔")
+    p_monthly.add_argument('--patch', action='store_true', help="直接改寫原檔，只改受影響的儲存格，其他分頁、格式及圖表原樣保留（輸出固定為 xlsx）")
+    p_monthly.add_argument('--quote-store', action='store_true', help="資料夾內沒有報價資訊時，使用參考資料庫的報價資訊")
+    p_monthly.add_argument('-o', '--output', help="輸出資料夾（預設目前資料夾）")
+    p_monthly.set_defaults(func=monthly)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except Exception as e:
+        print(f"錯誤：{str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
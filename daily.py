@@ -0,0 +1,165 @@
+import pandas as pd
+
+from classify import classify
+from lookup import composite_key, index_table, lookup, to_int
+from schema import compact
+
+COMMON_COLS = ['參考文件號碼', '項目', '物料', '工廠', '客戶', '銷售文件', 'sales_item', '以 PCLC 計', '數量', '過帳日期', 'BUn', '輸入日期']
+OUTPUT_COLS = ['文件(Billing號)', '物料', '品名', '產品群', '工廠', '線種', '課別', '通路', '客戶', '客戶名稱', '銷售文件', '銷售項目', 'billing項目', '以 PCLC 計', '數量', '過帳日期', 'BUn', '單位用銅', '銅量', '合約號碼', '採購單', '分類', '訂單月', '報價銅', '報價銅成本', '匯率', '報價單號', '業務員']
+
+
+def filter_input_dates(df, start_date, end_date):
+    """篩選輸入日期介於 start_date ~ end_date 的列"""
+    return filter_input_ranges(df, [(start_date, end_date)])
+
+
+def filter_input_ranges(df, ranges):
+    """篩選輸入日期落在任一 (start_date, end_date) 區間內的列"""
+    df['輸入日期'] = pd.to_datetime(df['輸入日期'], errors='coerce')
+    mask = pd.Series(False, index=df.index)
+    for start_date, end_date in ranges:
+        mask |= (df['輸入日期'] >= pd.to_datetime(start_date)) & (df['輸入日期'] <= pd.to_datetime(end_date))
+    return df[mask]
+
+
+def combine(df_sales, df_returns):
+    """銷貨收入與銷貨退回取共同欄位、金額及數量取負號後合併"""
+    df_sales = df_sales.rename(columns={'項目.1': 'sales_item'})
+    if not df_returns.empty:
+        df_returns = df_returns.rename(columns={'項目.1': 'sales_item'})
+
+    df_sales_common = df_sales[COMMON_COLS].copy()
+    df_sales_common['以 PCLC 計'] = -df_sales_common['以 PCLC 計']
+    df_sales_common['數量'] = -df_sales_common['數量']
+    if not df_returns.empty:
+        df_returns_common = df_returns[COMMON_COLS].copy()
+        df_returns_common['以 PCLC 計'] = -df_returns_common['以 PCLC 計']
+        df_returns_common['數量'] = -df_returns_common['數量']
+    else:
+        df_returns_common = pd.DataFrame(columns=COMMON_COLS)
+
+    return compact(pd.concat([df_sales_common, df_returns_common], ignore_index=True))
+
+
+def prepare_references(df_zsdc, df_contract, df_product):
+    """zsdc / 合約管理 / 產品群 建成以 key 為索引的參考表，整批資料只需建一次"""
+    df_zsdc['先前文件'] = to_int(df_zsdc['先前文件'])
+    df_zsdc['key'] = composite_key(df_zsdc['文件'], df_zsdc['項目'])
+    df_zsdc = df_zsdc.drop_duplicates(subset='key', keep='first')
+
+    if not df_contract.empty:
+        df_contract['合約編號'] = df_contract['合約編號'].astype(str)
+    if not df_product.empty:
+        df_product['料號'] = df_product['料號'].astype(str)
+    return build_references(df_zsdc, df_zsdc, df_contract if not df_contract.empty else None, df_product if not df_product.empty else None)
+
+
+def build_references(zsdc_item, zsdc_doc, contract=None, product=None):
+    """由已建好 key 的主檔資料建成參考表（上傳主檔及參考資料庫共用）
+
+    zsdc_item / zsdc_doc 分別用來以 文件+項目 及 先前文件 查詢（可為同一份）；合約管理 / 產品群 為 None 時不做對應
+    """
+    refs = {
+        'zsdc_item': index_table(zsdc_item, 'key', ['物料說明', '淨重']),
+        # 先前文件重複時以最後一筆為準（與原本 to_dict 的行為相同）
+        'zsdc_doc': index_table(zsdc_doc, '先前文件', ['bill-to-name', '合約號碼', '採購單號碼'], keep='last'),
+        'contract': None,
+        'product': None,
+    }
+    if contract is not None:
+        refs['contract'] = index_table(contract, '合約編號', ['產品部', '通路', '部門', '報價單號', '匯率', '業務', '報價銅價'])
+    if product is not None:
+        product_cols = ['產品群', '品名'] if '品名' in product.columns else ['產品群']
+        refs['product'] = index_table(product, '料號', product_cols)
+    return refs
+
+
+def map_combined(df_combined, refs, month):
+    """對合併後的銷貨資料做 mapping 及分類，回傳 OUTPUT_COLS 順序的結果（已 compact）；每列獨立計算，可分批呼叫"""
+    df_combined['銷售文件'] = to_int(df_combined['銷售文件'])
+    df_combined['參考文件號碼'] = to_int(df_combined['參考文件號碼'])
+    df_combined['項目'] = to_int(df_combined['項目'])
+    df_combined['key'] = composite_key(df_combined['參考文件號碼'], df_combined['項目'])
+
+    zsdc_item = lookup(df_combined['key'], refs['zsdc_item'])
+    df_combined['品名'] = zsdc_item['物料說明']
+    df_combined['單位用銅'] = zsdc_item['淨重']
+
+    # 記住沒有 zsdc 對應的行（主要是銷貨退回），後續輸出前清空數值欄位
+    no_zsdc_mask = df_combined['單位用銅'] == ''
+
+    zsdc_doc = lookup(df_combined['銷售文件'], refs['zsdc_doc']).fillna('')
+    df_combined['客戶名稱'] = zsdc_doc['bill-to-name']
+    df_combined['合約號碼'] = zsdc_doc['合約號碼']
+    df_combined['採購單'] = zsdc_doc['採購單號碼']
+
+    df_combined['單位用銅'] = pd.to_numeric(df_combined['單位用銅'], errors='coerce').fillna(0)
+    df_combined['銅量'] = df_combined['單位用銅'] * df_combined['數量']
+
+    if refs['contract'] is not None:
+        df_combined['合約號碼'] = df_combined['合約號碼'].astype(str)
+        contract = lookup(df_combined['合約號碼'], refs['contract'])
+        df_combined['線種'] = contract['產品部']
+        df_combined['產品群'] = ''
+        df_combined['通路'] = contract['通路']
+        df_combined['課別'] = contract['部門']
+        df_combined['報價單號'] = contract['報價單號']
+        df_combined['匯率'] = contract['匯率']
+        df_combined['業務員'] = contract['業務']
+        df_combined['報價銅'] = contract['報價銅價']
+        df_combined['線種'] = df_combined['線種'].replace({'銅通信電纜': '通信', '光通信電纜': '通信'})
+        # 線種為空值時，依物料開頭判斷
+        empty_line_mask = df_combined['線種'] == ''
+        df_combined.loc[empty_line_mask & df_combined['物料'].astype(str).str.startswith('G'), '線種'] = '電力'
+        df_combined.loc[empty_line_mask & df_combined['物料'].astype(str).str.startswith('6'), '線種'] = '通信'
+        df_combined['通路'] = df_combined['通路'].replace({
+            '電力': '經銷長約',
+            '經銷專案-特定': '經銷專案',
+            '電力專案': '專案',
+            '電力專案-綠能': '專案',
+            '經銷專案-產電': '經銷專案產電',
+            '電力專案-產電': '經銷專案產電',
+            '經銷專案-特開': '經銷專案',
+            '經銷專案-新商模': '經銷專案',
+            '經銷專案-綠能電力': '經銷專案',
+            '經銷專案-類長約': '經銷專案',
+            '電力專案-類長約': '經銷專案',
+            '通信專案': '民間通信',
+            '通信': '民間通信',
+        })
+        df_combined['報價銅'] = pd.to_numeric(df_combined['報價銅'], errors='coerce').fillna(0)
+        df_combined['報價銅成本'] = df_combined['報價銅'] * df_combined['銅量']
+
+    if refs['product'] is not None:
+        df_combined['物料'] = df_combined['物料'].astype(str)
+        product = lookup(df_combined['物料'], refs['product']).fillna('')
+        df_combined['產品群'] = product['產品群']
+        # 品名為空時（如銷貨退回），從產品群檔案補品名
+        if '品名' in product.columns:
+            empty_mask = df_combined['品名'] == ''
+            df_combined.loc[empty_mask, '品名'] = product.loc[empty_mask, '品名']
+
+    # 分類邏輯（規則見 classify.RULES）
+    df_combined['分類'], df_combined['訂單月'] = classify(df_combined, month)
+
+    df_combined['報價銅'] = pd.to_numeric(df_combined.get('報價銅', 0), errors='coerce').fillna(0)
+    df_combined['報價銅成本'] = df_combined['報價銅'] * df_combined['銅量']
+
+    # 沒有 zsdc 對應的行（如銷貨退回），數值欄位清為空值，產品群和品名保留
+    df_combined.loc[no_zsdc_mask, '單位用銅'] = None
+    df_combined.loc[no_zsdc_mask, '銅量'] = None
+    df_combined.loc[no_zsdc_mask, '報價銅'] = None
+    df_combined.loc[no_zsdc_mask, '報價銅成本'] = None
+    df_combined.loc[no_zsdc_mask, '匯率'] = None
+    df_combined.loc[no_zsdc_mask, '分類'] = ''
+
+    df_combined = df_combined.rename(columns={
+        '參考文件號碼': '文件(Billing號)',
+        '項目': 'billing項目',
+        'sales_item': '銷售項目',
+    })
+    df_combined['過帳日期'] = pd.to_datetime(df_combined['過帳日期'], errors='coerce').dt.strftime('%Y/%m/%d')
+    for col in OUTPUT_COLS:
+        if col not in df_combined.columns:
+            df_combined[col] = ''
+    return compact(df_combined[OUTPUT_COLS].copy())
@@ -0,0 +1,95 @@
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+MEASURES = ['銅量', '報價銅成本', '以 PCLC 計']
+DIMENSIONS = ['分類', '線種', '通路', '課別']
+DATE_COL = '過帳日期'
+BLANK = '（空白）'
+# 時間序列送到瀏覽器的點數上限（每條線），超過時改以週 / 月加總
+MAX_POINTS = 400
+FREQUENCIES = [('D', '日'), ('W', '週'), ('M', '月'), ('Q', '季')]
+# 時間序列最多畫幾條線，其餘併成「其他」
+MAX_SERIES = 8
+# 同時保留的 cube 數量（每日結果、月底結果、累積帳本）
+MAX_CACHED = 4
+
+
+def build_cube(df):
+    """以 分類 / 線種 / 通路 / 課別 / 過帳日期（日）分組加總 銅量、報價銅成本、以 PCLC 計，另記筆數
+
+    儀表板的篩選及拆分都從這份 cube 再加總，不必回頭掃原始明細
+    """
+    columns = {}
+    for col in DIMENSIONS:
+        s = df[col].astype(object) if col in df.columns else pd.Series('', index=df.index, dtype=object)
+        columns[col] = s.where(s.notna() & (s != ''), BLANK).astype(str)
+    columns[DATE_COL] = pd.to_datetime(df[DATE_COL], errors='coerce').dt.normalize() if DATE_COL in df.columns else pd.NaT
+    for col in MEASURES:
+        # '' 及文字視為 0（銷貨退回沒有 zsdc 對應時數值欄位為空）
+        columns[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) if col in df.columns else 0.0
+    flat = pd.DataFrame(columns, index=df.index)
+    flat['筆數'] = 1
+    cube = flat.groupby(DIMENSIONS + [DATE_COL], dropna=False, sort=True).sum().reset_index()
+    for col in DIMENSIONS:
+        cube[col] = cube[col].astype('category')
+    return cube
+
+
+@st.cache_data(max_entries=MAX_CACHED, show_spinner=False)
+def cached_cube(token, _load):
+    # _load 不參與快取 key 的計算，key 只看 token（每份資料產生時給一次）；資料不變時不會呼叫 _load 讀取明細
+    return build_cube(_load())
+
+
+def filter_cube(cube, filters, start_date=None, end_date=None):
+    """filters 為 {維度: [值]}，空的維度不篩；日期區間含頭尾，過帳日期空白的列只在不篩日期時保留"""
+    mask = pd.Series(True, index=cube.index)
+    for col, values in filters.items():
+        if values:
+            mask &= cube[col].isin(values)
+    if start_date is not None:
+        mask &= cube[DATE_COL] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= cube[DATE_COL] <= pd.Timestamp(end_date)
+    return cube[mask]
+
+
+def breakdown(cube, dimension, measure):
+    """依單一維度加總，由大到小排序"""
+    return (cube.groupby(dimension, observed=True)[[measure, '筆數']].sum()
+            .sort_values(measure, ascending=False).reset_index())
+
+
+def _top_series(cube, dimension, measure):
+    # 依絕對值取前 MAX_SERIES 大的類別，其餘併成「其他」
+    totals = cube.groupby(dimension, observed=True)[measure].sum().abs().sort_values(ascending=False)
+    keep = totals.index[:MAX_SERIES]
+    return cube[dimension].astype(str).where(cube[dimension].isin(keep), '其他')
+
+
+def time_series(cube, dimension, measure, max_points=MAX_POINTS):
+    """依過帳日期及維度加總的時間序列；日期點數超過 max_points 時依序改為週 / 月 / 季加總，回傳 (DataFrame, 頻率名稱)"""
+    dated = cube[cube[DATE_COL].notna()]
+    for freq, label in FREQUENCIES:
+        periods = dated[DATE_COL].dt.to_period(freq)
+        if periods.nunique() <= max_points:
+            break
+    data = pd.DataFrame({
+        dimension: _top_series(dated, dimension, measure),
+        DATE_COL: periods.dt.start_time,
+        measure: dated[measure],
+    })
+    return data.groupby([dimension, DATE_COL], sort=True)[measure].sum().reset_index(), label
+
+
+def bar_chart(data, dimension, measure):
+    fig = px.bar(data, x=dimension, y=measure, hover_data=['筆數'])
+    fig.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_title=None)
+    return fig
+
+
+def line_chart(data, dimension, measure, label):
+    fig = px.line(data, x=DATE_COL, y=measure, color=dimension, markers=len(data) <= 60)
+    fig.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_title=f"{DATE_COL}（每{label}）", legend_title=None)
+    return fig
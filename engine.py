@@ -0,0 +1,139 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import ledger
+import refstore
+import schema
+from daily import OUTPUT_COLS, combine, filter_input_ranges, map_combined, prepare_references
+from export import export
+from ingest import BATCH_SIZE, iter_batches, load_input
+from monthly import apply_month_end, patch_accumulated, prepare_accumulated
+
+# 平行處理時每個 worker 行程共用的參考表（由 _init_worker 設定，避免每個工作都重新傳一次）
+_worker_refs = None
+
+
+def _read_optional(src, name, read):
+    return read(src, name) if src is not None else pd.DataFrame()
+
+
+def _bytes(src):
+    if isinstance(src, (bytes, bytearray)):
+        return bytes(src)
+    if hasattr(src, 'getvalue'):
+        return src.getvalue()
+    return Path(src).read_bytes()
+
+
+def daily_references(zsdc, contract=None, product=None, read=load_input):
+    """讀取 zsdc / 合約管理 / 產品群 建成參考表；zsdc 為 None 時回傳 None，表示 mapping 時從參考資料庫查"""
+    if zsdc is None:
+        return None
+    return prepare_references(read(zsdc, 'zsdc'), _read_optional(contract, 'contract', read), _read_optional(product, 'product', read))
+
+
+def merge(parts):
+    """合併多個 mapping 結果（略過 None 及空的結果）"""
+    parts = [p for p in parts if p is not None and not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=OUTPUT_COLS)
+    return schema.concat(parts)
+
+
+def map_daily(df_combined, refs, month, store_path=refstore.DEFAULT_PATH, as_of=None):
+    """mapping 一批合併後的銷貨資料；refs 為 None 時只從參考資料庫查出這批用得到的主檔資料（as_of 為日期時查當時的版本）"""
+    batch_refs = refs if refs is not None else refstore.references(df_combined, store_path, as_of)
+    return map_combined(df_combined, batch_refs, month)
+
+
+def map_workbook(src, name, refs, month, ranges, stream=False, read=load_input, store_path=refstore.DEFAULT_PATH, as_of=None,
+                 batch_size=BATCH_SIZE):
+    """mapping 單一銷貨收入 / 退回檔（name 為 'sales' 或 'returns'），只保留輸入日期落在 ranges 內的列；串流時每批 batch_size 列"""
+    def in_range(df):
+        return filter_input_ranges(df, ranges)
+
+    if stream:
+        # 逐批讀取、篩選、mapping，只累積日期區間內的結果
+        return merge([map_daily(combine(df_batch, pd.DataFrame()), refs, month, store_path, as_of)
+                      for df_batch in iter_batches(src, name, batch_size, row_filter=in_range)])
+    df = in_range(read(src, name))
+    if df.empty:
+        return None
+    return map_daily(combine(df, pd.DataFrame()), refs, month, store_path, as_of)
+
+
+def run_daily(sales, returns, refs, month, ranges, stream=False, read=load_input, store_path=refstore.DEFAULT_PATH, as_of=None):
+    """每日作業：銷貨收入及銷貨退回（可為 None）各自 mapping 後合併，回傳 OUTPUT_COLS 的結果（已 compact）"""
+    return merge([map_workbook(src, name, refs, month, ranges, stream, read, store_path, as_of)
+                  for name, src in [('sales', sales), ('returns', returns)] if src is not None])
+
+
+def _init_worker(refs):
+    global _worker_refs
+    _worker_refs = refs
+
+
+def _daily_job(src, name, month, ranges, stream, store_path, as_of):
+    return map_workbook(src, name, _worker_refs, month, ranges, stream, store_path=store_path, as_of=as_of)
+
+
+def run_daily_many(workbooks, refs, month, ranges, stream=False, workers=None, store_path=refstore.DEFAULT_PATH, as_of=None):
+    """多個銷貨檔（[(name, 路徑)]，例如每天或每個工廠一個檔）分到多個行程平行 mapping，依輸入順序合併結果
+
+    每個檔在同一個行程內讀取一次，套用全部日期區間；參考表每個行程只傳一次
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(refs,)) as pool:
+        futures = [pool.submit(_daily_job, src, name, month, ranges, stream, store_path, as_of) for name, src in workbooks]
+        return merge([f.result() for f in futures])
+
+
+def load_quote(quote=None, use_store=False, read=load_input, store_path=refstore.DEFAULT_PATH, as_of=None):
+    """報價資訊：有檔案就讀檔，否則視 use_store 從參考資料庫讀取（as_of 為日期時讀當時的版本），都沒有時為 None"""
+    if quote is not None:
+        return read(quote, 'quote')
+    if use_store:
+        return refstore.load_table('quote', store_path, as_of)
+    return None
+
+
+def run_monthly(accumulated, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, patch=False,
+                read=load_input, ledger_path=ledger.DEFAULT_PATH):
+    """月底作業，回傳 (結果 DataFrame, 改寫後的原檔 BytesIO, 改寫的儲存格數)
+
+    accumulated 為 None 時直接在累積帳本上覆寫；patch 時改寫原檔，否則原檔 BytesIO 為 None
+    """
+    if accumulated is None:
+        # 直接在累積帳本上覆寫，只更新受影響的列
+        df = ledger.month_end(df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, path=ledger_path)
+        return df, None, 0
+    if patch:
+        # 只改寫原檔中有變動的儲存格，其餘內容原樣保留
+        output, df, count = patch_accumulated(_bytes(accumulated), df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict)
+        return df, output, count
+    # 讀取累積檔案的 data實績 分頁（前兩行為隱藏行，第三行為標題）
+    # 覆寫完才 compact：匯率等欄位在覆寫時要放得下任意數值
+    df = prepare_accumulated(read(accumulated, 'accumulated'))
+    df = apply_month_end(df, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict)
+    return schema.compact(df), None, 0
+
+
+def _monthly_job(src, output_path, fmt, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, patch):
+    df_quote = df_quote.copy() if df_quote is not None else None
+    df, output, count = run_monthly(src, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, patch)
+    Path(output_path).write_bytes((output or export(df, fmt)).getvalue())
+    return len(df), count
+
+
+def run_monthly_many(jobs, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, fmt='xlsx', patch=False, workers=None):
+    """多個累積檔（[(輸入路徑, 輸出路徑)]）平行做月底覆寫，各自寫出結果檔；回傳各檔的 (列數, 改寫的儲存格數)
+
+    patch 時輸出固定為改寫後的 xlsx 原檔
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_monthly_job, src, output_path, fmt, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, patch)
+            for src, output_path in jobs
+        ]
+        return [f.result() for f in futures]
@@ -0,0 +1,84 @@
+from io import BytesIO
+
+import pandas as pd
+
+from schema import expand
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+FORMATS = {
+    'xlsx': {'name': 'Excel', 'label': 'Excel (.xlsx)', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'csv': {'name': 'CSV', 'label': 'CSV (.csv，較快)', 'mime': 'text/csv'},
+}
+if HAS_PARQUET:
+    FORMATS['parquet'] = {'name': 'Parquet', 'label': 'Parquet (.parquet，最快)', 'mime': 'application/vnd.apache.parquet'}
+
+# xlsx 每次轉成 Python 值寫出的列數，避免整份資料一次轉成 list
+CHUNK_ROWS = 10_000
+
+
+def _cells(df):
+    # 空值一律轉成 None，寫出時成為空白格；其餘依型別寫成數字 / 日期 / 文字
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return zip(*columns)
+
+
+def to_xlsx(df, output, sheet_name='Sheet1'):
+    """以 xlsxwriter constant_memory 模式逐列寫出，不建立整份 openpyxl 物件樹；未安裝 xlsxwriter 時退回 to_excel"""
+    if xlsxwriter is None:
+        df.to_excel(output, index=False, sheet_name=sheet_name)
+        return
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'default_date_format': 'yyyy/mm/dd',
+    })
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    worksheet.write_row(0, 0, [str(c) for c in df.columns], header_format)
+    for start in range(0, len(df), CHUNK_ROWS):
+        for i, row in enumerate(_cells(df.iloc[start:start + CHUNK_ROWS])):
+            worksheet.write_row(start + i + 1, 0, row)
+    workbook.close()
+
+
+def to_parquet(df, output):
+    # object 欄位型別不一時 parquet 無法決定型別：除了 '' 都是數字的欄位（例如沒對到合約時匯率為 ''）把 '' 當成空值、
+    # 維持數值型別，真的混有文字與數字的欄位才轉成文字（空值保留）
+    df = df.copy()
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ('string', 'empty', 'floating', 'integer', 'datetime', 'boolean'):
+            blank = s.eq('')
+            num = pd.to_numeric(s.mask(blank), errors='coerce')
+            if (num.notna() | s.isna() | blank).all():
+                df[col] = num
+            else:
+                df[col] = s.where(s.isna(), s.astype(str))
+    df.to_parquet(output, index=False)
+
+
+def export(df, fmt):
+    """依下載格式輸出成 BytesIO（先把 compact 過的欄位轉回一般型別）"""
+    df = expand(df)
+    output = BytesIO()
+    if fmt == 'xlsx':
+        to_xlsx(df, output)
+    elif fmt == 'csv':
+        # 加 BOM，Excel 直接開啟時中文不會變亂碼
+        df.to_csv(output, index=False, encoding='utf-8-sig')
+    elif fmt == 'parquet':
+        to_parquet(df, output)
+    else:
+        raise ValueError(f"不支援的下載格式：{fmt}")
+    output.seek(0)
+    return output
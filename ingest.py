@@ -0,0 +1,172 @@
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+try:
+    import python_calamine  # noqa: F401
+    ENGINES = ['calamine', 'openpyxl']
+except ImportError:
+    ENGINES = ['openpyxl']
+
+# 串流模式每批讀取的列數
+BATCH_SIZE = 50_000
+
+_SALES_COLS = ['參考文件號碼', '項目', '物料', '工廠', '客戶', '銷售文件', '項目.1', '以 PCLC 計', '數量', '過帳日期', 'BUn', '輸入日期']
+
+# 各輸入檔的分頁、標題列及程式會用到的欄位；columns 為 None 表示整張分頁都要（例如月底要原樣輸出）
+INPUTS = {
+    'sales': {'sheet_name': '工作表1', 'columns': _SALES_COLS},
+    'returns': {'sheet_name': '工作表1', 'columns': _SALES_COLS},
+    'zsdc': {'sheet_name': '工作表1', 'columns': ['文件', '項目', '先前文件', '物料說明', '淨重', 'bill-to-name', '合約號碼', '採購單號碼']},
+    'contract': {'sheet_name': '已篩選', 'columns': ['合約編號', '產品部', '通路', '部門', '報價單號', '匯率', '業務', '報價銅價']},
+    'product': {'sheet_name': '工作表1', 'columns': ['料號', '產品群'], 'optional': ['品名']},
+    'accumulated': {'sheet_name': 'data實績', 'header': 2, 'columns': None, 'required': ['分類', '採購單', '合約號碼', '報價銅', '匯率', '銅量']},
+    'quote': {'sheet_name': 'qry_Temp', 'columns': ['合約編號', '銅價+銅價調整', '匯率']},
+}
+
+
+def _source(src):
+    # 同一個來源可能要讀兩次（標題列 + 資料），file-like 需要回到開頭
+    if isinstance(src, (bytes, bytearray)):
+        return BytesIO(src)
+    if hasattr(src, 'seek'):
+        src.seek(0)
+    return src
+
+
+def _read(src, engine, **kwargs):
+    engines = [engine] if engine else ENGINES
+    for i, name in enumerate(engines):
+        try:
+            return pd.read_excel(_source(src), engine=name, **kwargs)
+        except Exception:
+            # 較快的 engine 讀不了時退回 openpyxl
+            if i == len(engines) - 1:
+                raise
+
+
+def read_header(src, sheet_name, header=0):
+    """以 openpyxl read-only 只讀到標題列，不必解析整張分頁；欄名處理（去空白、重複欄名加 .1）與 read_excel 相同"""
+    wb = openpyxl.load_workbook(_source(src), read_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(min_row=header + 1, max_row=header + 1, values_only=True)
+        return _header_names(next(rows, ()))
+    finally:
+        wb.close()
+
+
+def _check_columns(name, spec, names):
+    columns = spec['columns']
+    required = columns if columns is not None else spec.get('required', [])
+    missing = [c for c in required if c not in names]
+    if missing:
+        raise ValueError(f"{name} 檔案（{spec['sheet_name']} 分頁）缺少欄位：{'、'.join(missing)}")
+
+
+def _positions(spec, names):
+    wanted = set(spec['columns']) | set(spec.get('optional', []))
+    return [i for i, c in enumerate(names) if c in wanted]
+
+
+def load_input(src, name, engine=None):
+    """依 INPUTS[name] 讀取輸入檔，只讀需要的欄位；缺少必要欄位時直接報錯"""
+    spec = INPUTS[name]
+    sheet_name, header = spec['sheet_name'], spec.get('header', 0)
+
+    if spec['columns'] is None:
+        # 整張分頁都要時直接讀一次，讀完再檢查欄位
+        df = _read(src, engine, sheet_name=sheet_name, header=header)
+        df.columns = [str(c).strip() for c in df.columns]
+        _check_columns(name, spec, list(df.columns))
+        return df
+
+    names = read_header(src, sheet_name, header)
+    _check_columns(name, spec, names)
+
+    positions = _positions(spec, names)
+    df = _read(src, engine, sheet_name=sheet_name, header=header, usecols=positions)
+    df.columns = [names[i] for i in positions]
+    return df
+
+
+def _cell(value):
+    # 與 pandas 讀 openpyxl 的轉換一致：空白格為 ''，整數值的 float 轉成 int
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _header_names(header_row):
+    # 標題列交給 TextParser 處理，重複欄名與 read_excel 一樣會變成 '項目.1'
+    return [str(c).strip() for c in TextParser([[_cell(v) for v in header_row]], header=0).read().columns]
+
+
+def load_rows(src, name):
+    """以 openpyxl read-only 讀取 INPUTS[name] 整張分頁，index 為 Excel 列號（略過空白列），供回寫原檔使用"""
+    spec = INPUTS[name]
+    header = spec.get('header', 0)
+    wb = openpyxl.load_workbook(_source(src), read_only=True, data_only=True)
+    try:
+        rows = wb[spec['sheet_name']].iter_rows(values_only=True)
+        for _ in range(header):
+            next(rows, None)
+        names = _header_names(next(rows, ()))
+        _check_columns(name, spec, names)
+
+        data, row_numbers = [], []
+        # read-only 模式從第 1 列開始逐列交出（中間的空白列也會交出）
+        for row_number, row in enumerate(rows, start=header + 2):
+            values = [_cell(row[i]) if i < len(row) else '' for i in range(len(names))]
+            if any(v != '' for v in values):
+                data.append(values)
+                row_numbers.append(row_number)
+    finally:
+        wb.close()
+
+    df = TextParser(data, names=names, header=None).read() if data else pd.DataFrame(columns=names)
+    df.index = row_numbers
+    return df
+
+
+def iter_batches(src, name, batch_size=BATCH_SIZE, row_filter=None):
+    """以 openpyxl read-only 逐批讀取 INPUTS[name]，每批先經 row_filter 過濾再交出
+
+    記憶體只跟批次大小及留下來的列數有關，不必整張分頁載入；全部被過濾掉的批次不會交出
+    """
+    spec = INPUTS[name]
+    if spec['columns'] is None:
+        raise ValueError(f"{name} 需要整張分頁，不支援串流讀取")
+
+    wb = openpyxl.load_workbook(_source(src), read_only=True, data_only=True)
+    try:
+        rows = wb[spec['sheet_name']].iter_rows(values_only=True)
+        for _ in range(spec.get('header', 0)):
+            next(rows, None)
+        names = _header_names(next(rows, ()))
+        _check_columns(name, spec, names)
+
+        positions = _positions(spec, names)
+        columns = [names[i] for i in positions]
+
+        def frame(batch):
+            df = TextParser(batch, names=columns, header=None).read()
+            return row_filter(df) if row_filter else df
+
+        batch = []
+        for row in rows:
+            batch.append([_cell(row[i]) if i < len(row) else '' for i in positions])
+            if len(batch) >= batch_size:
+                df = frame(batch)
+                batch = []
+                if not df.empty:
+                    yield df
+        if batch:
+            df = frame(batch)
+            if not df.empty:
+                yield df
+    finally:
+        wb.close()
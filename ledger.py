@@ -0,0 +1,168 @@
+import sqlite3
+
+import pandas as pd
+
+from classify import M1, M2
+from daily import OUTPUT_COLS
+from monthly import UPDATED_COLS, affected_rows, apply_month_end
+from schema import expand
+from sqlutil import now, q, to_rows
+
+DEFAULT_PATH = 'ledger.sqlite'
+KEY_COLS = ['文件(Billing號)', 'billing項目']
+# 由其他欄位算出來的欄位不能手動修正，讀取時依修正後的 報價銅 / 銅量 重算
+DERIVED_COLS = ['報價銅成本']
+# 月底作業會讀的欄位：這些欄位的手動修正在月底計算前先套用（決定要不要改、改成什麼價格），但不寫進 rows
+MONTH_END_INPUT_COLS = ['分類', '訂單月', '合約號碼', '銅量']
+
+
+def connect(path=DEFAULT_PATH):
+    """開啟累積帳本，第一次使用時建立資料表
+
+    rows：每日 mapping 結果，以 (文件(Billing號), billing項目) 為 key
+    overrides：手動修正，重新計算或重新匯入都不會被蓋掉，讀取時套用在 rows 之上
+    """
+    conn = sqlite3.connect(path)
+    cols = ', '.join(q(c) for c in OUTPUT_COLS)
+    keys = ', '.join(q(c) for c in KEY_COLS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS rows ({cols}, updated_at TEXT, PRIMARY KEY ({keys}))")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS overrides "
+        "(doc INTEGER, item INTEGER, col TEXT, value, updated_at TEXT, PRIMARY KEY (doc, item, col))"
+    )
+    return conn
+
+
+def upsert(df, path=DEFAULT_PATH):
+    """每日結果寫入帳本，同一 key 已存在時以新資料取代；回傳 (寫入筆數, 同批資料中 key 重複而捨棄的筆數)
+
+    同一批裡 key 重複時以最後一筆為準
+    """
+    df = expand(df[OUTPUT_COLS])
+    duplicated = int(df.duplicated(subset=KEY_COLS, keep='last').sum())
+    df = df.drop_duplicates(subset=KEY_COLS, keep='last')
+    cols = ', '.join(q(c) for c in OUTPUT_COLS)
+    marks = ', '.join('?' for _ in OUTPUT_COLS)
+    updates = ', '.join(f"{q(c)} = excluded.{q(c)}" for c in OUTPUT_COLS + ['updated_at'] if c not in KEY_COLS)
+    keys = ', '.join(q(c) for c in KEY_COLS)
+    updated_at = now()
+    with connect(path) as conn:
+        conn.executemany(
+            f"INSERT INTO rows ({cols}, updated_at) VALUES ({marks}, ?) ON CONFLICT ({keys}) DO UPDATE SET {updates}",
+            [row + (updated_at,) for row in to_rows(df)],
+        )
+    conn.close()
+    return len(df), duplicated
+
+
+def set_override(doc, item, col, value, path=DEFAULT_PATH):
+    """手動修正單一欄位；value 為 None 時刪除修正"""
+    if col not in OUTPUT_COLS or col in KEY_COLS or col in DERIVED_COLS:
+        raise ValueError(f"不能修正欄位：{col}")
+    with connect(path) as conn:
+        if value is None:
+            conn.execute("DELETE FROM overrides WHERE doc = ? AND item = ? AND col = ?", (int(doc), int(item), col))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO overrides (doc, item, col, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (int(doc), int(item), col, value, now()),
+            )
+    conn.close()
+
+
+def load_overrides(path=DEFAULT_PATH):
+    with connect(path) as conn:
+        df = pd.read_sql_query("SELECT doc, item, col, value, updated_at FROM overrides ORDER BY updated_at", conn)
+    conn.close()
+    return df
+
+
+def _load_rows(path):
+    # 帳本原始資料（未套用手動修正）
+    cols = ', '.join(q(c) for c in OUTPUT_COLS)
+    keys = ', '.join(q(c) for c in KEY_COLS)
+    with connect(path) as conn:
+        df = pd.read_sql_query(f"SELECT {cols} FROM rows ORDER BY {keys}", conn)
+    conn.close()
+    return df
+
+
+def _apply_overrides(df, overrides):
+    # 依 (文件, 項目) 把修正值蓋到對應的欄位上
+    index = pd.MultiIndex.from_frame(df[KEY_COLS])
+    for col, group in overrides.groupby('col'):
+        values = group.set_index(['doc', 'item'])['value']
+        matched = index.isin(values.index)
+        df[col] = df[col].astype(object)
+        df.loc[matched, col] = values.reindex(index[matched]).to_numpy()
+    return df
+
+
+def load(path=DEFAULT_PATH):
+    """讀取整本帳本（已套用手動修正），欄位順序同每日輸出；有修正 報價銅 / 銅量 的列重算報價銅成本"""
+    df = _load_rows(path)
+
+    overrides = load_overrides(path)
+    if not overrides.empty:
+        df = _apply_overrides(df, overrides)
+        inputs = overrides[overrides['col'].isin(['報價銅', '銅量'])]
+        if not inputs.empty:
+            index = pd.MultiIndex.from_frame(df[KEY_COLS])
+            touched = index.isin(pd.MultiIndex.from_frame(inputs[['doc', 'item']]))
+            cost = pd.to_numeric(df.loc[touched, '報價銅'], errors='coerce') * pd.to_numeric(df.loc[touched, '銅量'], errors='coerce')
+            df['報價銅成本'] = df['報價銅成本'].astype(object)
+            df.loc[touched, '報價銅成本'] = cost
+    return df
+
+
+def _month_end_candidates(conn, df_quote):
+    # 只讀出月底可能改到的列：M-1/M-2、合約號碼在報價資訊內，以及月底輸入欄位有手動修正的列
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS quoted (k PRIMARY KEY)")
+    conn.execute("DELETE FROM quoted")
+    if df_quote is not None and not df_quote.empty:
+        conn.executemany("INSERT OR IGNORE INTO quoted VALUES (?)", [(k,) for k in df_quote['合約編號'].astype(str).unique().tolist()])
+    cols = ', '.join(f"r.{q(c)}" for c in OUTPUT_COLS)
+    doc, item = (q(c) for c in KEY_COLS)
+    marks = ', '.join('?' for _ in MONTH_END_INPUT_COLS)
+    return pd.read_sql_query(
+        f"SELECT {cols} FROM rows r WHERE r.{q('分類')} IN (?, ?) "
+        f"OR CAST(r.{q('合約號碼')} AS TEXT) IN (SELECT k FROM quoted) "
+        f"OR EXISTS (SELECT 1 FROM overrides o WHERE o.doc = r.{doc} AND o.item = r.{item} AND o.col IN ({marks}))",
+        conn, params=[M1, M2] + MONTH_END_INPUT_COLS,
+    )
+
+
+def month_end(df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict, path=DEFAULT_PATH):
+    """直接在帳本上做月底覆寫，只讀出並寫回受影響的列（M-1/M-2 及對得到報價資訊的合約），回傳套用修正後的整本帳本
+
+    分類 / 訂單月 / 合約號碼 / 銅量 的手動修正先套用再計算；寫回 rows 的只有 UPDATED_COLS，
+    其中 訂單月 及 報價銅成本 以未修正的原始值計算，修正本身不會被寫進帳本
+    """
+    with connect(path) as conn:
+        df = _month_end_candidates(conn, df_quote)
+        overrides = pd.read_sql_query(
+            f"SELECT doc, item, col, value FROM overrides WHERE col IN ({', '.join('?' for _ in MONTH_END_INPUT_COLS)})",
+            conn, params=MONTH_END_INPUT_COLS,
+        )
+    conn.close()
+
+    raw = df[['訂單月', '銅量']].apply(pd.to_numeric, errors='coerce')
+    if not overrides.empty:
+        df = _apply_overrides(df, overrides)
+    df = df.loc[affected_rows(df, df_quote)]
+    # 空字串欄位讀回來是 str dtype，先轉 object 才能寫入數值
+    part = apply_month_end(df.astype({c: object for c in UPDATED_COLS}), df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict)
+    part['訂單月'] = raw.loc[part.index, '訂單月']
+    part['報價銅成本'] = part['報價銅'] * raw.loc[part.index, '銅量'].fillna(0)
+
+    sets = ', '.join(f"{q(c)} = ?" for c in UPDATED_COLS + ['updated_at'])
+    where = ' AND '.join(f"{q(c)} = ?" for c in KEY_COLS)
+    updated_at = now()
+    with connect(path) as conn:
+        conn.executemany(
+            f"UPDATE rows SET {sets} WHERE {where}",
+            [row[:len(UPDATED_COLS)] + (updated_at,) + row[len(UPDATED_COLS):] for row in to_rows(part[UPDATED_COLS + KEY_COLS])],
+        )
+    conn.close()
+    # 重新讀取，讓手動修正仍然蓋在重算結果之上
+    return load(path)
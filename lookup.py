@@ -0,0 +1,30 @@
+import pandas as pd
+
+# 項目號碼上限（SAP 項目最多 6 碼），用於組合整數 key
+ITEM_BASE = 1_000_000
+
+
+def to_int(s):
+    """轉成整數，無法轉換者補 0（與原本 to_numeric + fillna(0) + astype(int) 相同）"""
+    return pd.to_numeric(s, errors='coerce').fillna(0).astype('int64')
+
+
+def composite_key(doc, item):
+    """文件號碼 + 項目 組成單一整數 key，取代字串串接的 '文件_項目'"""
+    return to_int(doc) * ITEM_BASE + to_int(item)
+
+
+def index_table(ref, key_col, cols, keep='first'):
+    """建立以 key 為索引的參考表，key_col 重複時依 keep 保留"""
+    return ref.drop_duplicates(subset=key_col, keep=keep).set_index(key_col)[cols]
+
+
+def lookup(keys, table, fill=''):
+    """以 key 對照 index_table 建好的參考表，一次取回多個欄位
+
+    keys: 要查找的 key（Series，結果沿用其 index）
+    fill: 查無 key 時的填補值；有 key 但值為空時保留 NaN，與 dict.get 的行為一致
+    """
+    result = table.reindex(keys.to_numpy(), fill_value=fill)
+    result.index = keys.index
+    return result
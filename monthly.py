@@ -0,0 +1,223 @@
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from xml.etree import ElementTree
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from classify import M1, M2, order_month
+from ingest import INPUTS, load_rows
+from lookup import index_table, lookup
+from schema import to_float64
+
+# 月底作業會覆寫的欄位
+UPDATED_COLS = ['報價銅', '匯率', '報價銅成本', '訂單月']
+# 回寫原檔時只改這幾欄
+PATCHED_COLS = ['報價銅', '匯率', '報價銅成本']
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_ROW = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*?(/?)>')
+_CELL = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.S)
+_STYLE = re.compile(rb'\bs="\d+"')
+_FORMULA = re.compile(rb'<f\b')
+
+
+def prepare_accumulated(df):
+    """整理累積檔案 data實績 分頁：欄名去空白、移除空白列，沒有訂單月時從採購單解析"""
+    df.columns = [str(c).strip() if pd.notna(c) else f'col_{j}' for j, c in enumerate(df.columns)]
+    df = df.dropna(how='all').reset_index(drop=True)
+
+    return _fill_order_month(df)
+
+
+def _fill_order_month(df):
+    # 訂單月：如果檔案沒有，從採購單解析
+    if '訂單月' not in df.columns:
+        df['訂單月'] = order_month(df['採購單']).where(df['分類'] == M2)
+    return df
+
+
+def affected_rows(df, df_quote=None):
+    """月底作業會改到的列：經銷長約(M-1)/(M-2) 及合約號碼對得到報價資訊的列"""
+    mask = df['分類'].isin([M1, M2])
+    if df_quote is not None and not df_quote.empty:
+        mask |= df['合約號碼'].astype(str).isin(df_quote['合約編號'].astype(str))
+    return mask
+
+
+def apply_month_end(df, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict):
+    """報價資訊及 M-1/M-2 銅價、匯率覆寫報價銅和匯率，並重新計算報價銅成本"""
+    # 整欄整數（int64）、float32（compact 過）或全為文字（str）的匯率欄放不進覆寫的匯率，先轉成 float64 / object
+    df['匯率'] = to_float64(df['匯率']) if pd.api.types.is_numeric_dtype(df['匯率']) else df['匯率'].astype(object)
+
+    # 報價資訊覆寫報價銅和匯率（有對到才覆寫）
+    if df_quote is not None:
+        df_quote['合約編號'] = df_quote['合約編號'].astype(str)
+        df['合約號碼'] = df['合約號碼'].astype(str)
+        quote = lookup(df['合約號碼'], index_table(df_quote, '合約編號', ['銅價+銅價調整', '匯率']), fill=np.nan)
+        df['報價銅'] = quote['銅價+銅價調整'].where(quote['銅價+銅價調整'].notna(), df['報價銅'])
+        df['匯率'] = quote['匯率'].where(quote['匯率'].notna(), df['匯率'])
+
+    # M-1/M-2 銅價及匯率覆寫
+    df['報價銅'] = pd.to_numeric(df['報價銅'], errors='coerce').fillna(0).astype('float64')
+    df['銅量'] = pd.to_numeric(df['銅量'], errors='coerce').fillna(0)
+    df['訂單月'] = pd.to_numeric(df.get('訂單月', pd.Series(dtype='float64')), errors='coerce')
+
+    df.loc[df['分類'] == M1, '報價銅'] = m1_copper_price
+    df.loc[df['分類'] == M1, '匯率'] = m1_exchange_rate
+    mask_m2 = df['分類'] == M2
+    df.loc[mask_m2, '報價銅'] = df.loc[mask_m2, '訂單月'].map(m2_dict).fillna(df.loc[mask_m2, '報價銅'])
+    df.loc[mask_m2, '匯率'] = df.loc[mask_m2, '訂單月'].map(m2_rate_dict).fillna(df.loc[mask_m2, '匯率'])
+
+    # 重新計算報價銅成本
+    df['報價銅'] = pd.to_numeric(df['報價銅'], errors='coerce').fillna(0)
+    df['報價銅成本'] = df['報價銅'] * df['銅量']
+    return df
+
+
+def _changed(old, new):
+    old, new = pd.to_numeric(old, errors='coerce'), pd.to_numeric(new, errors='coerce')
+    return ~((old == new) | (old.isna() & new.isna()))
+
+
+def patch_accumulated(data, df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict):
+    """月底覆寫直接改寫原累積檔：只重寫受影響列的 報價銅 / 匯率 / 報價銅成本 儲存格
+
+    只改分頁 XML 中這些儲存格，其他分頁、隱藏列、格式、圖表、圖片都原樣保留；公式儲存格不覆寫。
+    回傳 (新檔 BytesIO, 結果 DataFrame, 改寫的儲存格數)
+    """
+    spec = INPUTS['accumulated']
+    df = _fill_order_month(load_rows(data, 'accumulated'))
+    mask = affected_rows(df, df_quote)
+    part = apply_month_end(df.loc[mask].copy(), df_quote, m1_copper_price, m1_exchange_rate, m2_dict, m2_rate_dict)
+
+    positions = {c: j + 1 for j, c in enumerate(df.columns)}
+    cells = {}
+    for col in PATCHED_COLS:
+        # 整欄都是整數時讀進來是 int64，先轉 float64 才放得下重算結果
+        old = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        new = pd.to_numeric(part[col], errors='coerce').astype('float64')
+        changed = _changed(old.loc[mask], new)
+        for row_number, value in new.loc[changed].items():
+            cells[(row_number, positions[col])] = None if pd.isna(value) else float(value)
+        df[col] = old
+        df.loc[part.index, col] = new
+
+    patched = _patch_sheet_xml(data, spec['sheet_name'], cells)
+    if patched is None:
+        patched = _patch_workbook(data, spec['sheet_name'], cells)
+    output, count = patched
+    return output, df.reset_index(drop=True), count
+
+
+def _sheet_part(zf, sheet_name):
+    # 由 workbook.xml 及其 rels 找到分頁對應的 XML 檔
+    workbook = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    rels = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    for sheet in workbook.iter(f'{{{MAIN_NS}}}sheet'):
+        if sheet.get('name') == sheet_name:
+            rel_id = sheet.get(f'{{{REL_NS}}}id')
+            target = next(r.get('Target') for r in rels if r.get('Id') == rel_id)
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    raise ValueError(f"找不到分頁：{sheet_name}")
+
+
+def _cell_xml(ref, value, style=b''):
+    if value is None:
+        return b'<c r="%s"%s/>' % (ref, style)
+    return b'<c r="%s"%s><v>%s</v></c>' % (ref, style, repr(value).encode())
+
+
+def _patch_row(body, row_number, values):
+    # values 為 {欄號: 值}；已存在的儲存格保留樣式改寫數值，不存在的依欄位順序插入
+    pending = sorted(values.items())
+    pieces, pos, count = [], 0, 0
+    for m in _CELL.finditer(body):
+        column = column_index_from_string(m.group(1).decode())
+        while pending and pending[0][0] < column:
+            c, value = pending.pop(0)
+            pieces += [body[pos:m.start()], _cell_xml(f'{get_column_letter(c)}{row_number}'.encode(), value)]
+            pos = m.start()
+            count += 1
+        if pending and pending[0][0] == column:
+            _, value = pending.pop(0)
+            if _FORMULA.search(m.group(0)):
+                continue
+            style = _STYLE.search(m.group(0))
+            ref = f'{m.group(1).decode()}{row_number}'.encode()
+            pieces += [body[pos:m.start()], _cell_xml(ref, value, b' ' + style.group(0) if style else b'')]
+            pos = m.end()
+            count += 1
+    pieces.append(body[pos:])
+    for c, value in pending:
+        pieces.append(_cell_xml(f'{get_column_letter(c)}{row_number}'.encode(), value))
+        count += 1
+    return b''.join(pieces), count
+
+
+def _patch_sheet_xml(data, sheet_name, cells):
+    """直接改寫 xlsx 內分頁 XML 的 <c> 元素，其餘檔案原樣複製；回傳 (新檔 BytesIO, 改寫的儲存格數)
+
+    找不到要改的列（例如列沒有 r 屬性）時回傳 None
+    """
+    rows = {}
+    for (row_number, column), value in cells.items():
+        rows.setdefault(row_number, {})[column] = value
+
+    with zipfile.ZipFile(BytesIO(data)) as zin:
+        part = _sheet_part(zin, sheet_name)
+        xml = zin.read(part)
+        pieces, pos, count = [], 0, 0
+        for m in _ROW.finditer(xml):
+            row_number = int(m.group(1))
+            if row_number not in rows:
+                continue
+            if m.group(2):
+                # 空白列 <row .../>
+                start_tag, body, end = m.group(0)[:-2] + b'>', b'', m.end()
+            else:
+                close = xml.index(b'</row>', m.end())
+                start_tag, body, end = m.group(0), xml[m.end():close], close + len(b'</row>')
+            body, n = _patch_row(body, row_number, rows.pop(row_number))
+            pieces += [xml[pos:m.start()], start_tag, body, b'</row>']
+            pos = end
+            count += n
+        if rows:
+            return None
+        pieces.append(xml[pos:])
+
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for item in zin.infolist():
+                if item.filename == part:
+                    content = b''.join(pieces)
+                elif item.filename == 'xl/workbook.xml':
+                    # 公式的快取值可能過期，開檔時請 Excel 重算
+                    content = re.sub(rb'<calcPr\b(?![^>]*fullCalcOnLoad)', b'<calcPr fullCalcOnLoad="1"', zin.read(item), count=1)
+                else:
+                    content = zin.read(item)
+                zout.writestr(item, content)
+    output.seek(0)
+    return output, count
+
+
+def _patch_workbook(data, sheet_name, cells):
+    # 分頁 XML 無法直接改寫時改用 openpyxl 載入整本再存檔（較慢，圖表、圖片不會保留）
+    wb = openpyxl.load_workbook(BytesIO(data))
+    ws = wb[sheet_name]
+    count = 0
+    for (row_number, column), value in cells.items():
+        cell = ws.cell(row=row_number, column=column)
+        if cell.data_type == 'f':
+            continue
+        cell.value = value
+        count += 1
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output, count
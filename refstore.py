@@ -0,0 +1,176 @@
+import datetime
+import sqlite3
+
+import pandas as pd
+
+from daily import build_references
+from ingest import INPUTS
+from lookup import composite_key, to_int
+from sqlutil import now, q, to_rows
+
+DEFAULT_PATH = 'reference.sqlite'
+
+# 各主檔的 key 及額外索引；zsdc 的 key 為 文件 + 項目 組成的整數 key
+TABLES = {
+    'zsdc': {'key': 'key', 'indexes': ['先前文件']},
+    'contract': {'key': '合約編號', 'indexes': []},
+    'product': {'key': '料號', 'indexes': []},
+    'quote': {'key': '合約編號', 'indexes': []},
+}
+
+
+def _columns(name):
+    spec = INPUTS[name]
+    cols = spec['columns'] + spec.get('optional', [])
+    return ['key'] + cols if name == 'zsdc' else cols
+
+
+def _create(conn, name):
+    key = q(TABLES[name]['key'])
+    cols = ', '.join(q(c) for c in _columns(name))
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {name} ({cols}, seq INTEGER, loaded_on TEXT, replaced_on TEXT)")
+    # 同一 key 只能有一筆現行資料（replaced_on 為空），舊版本保留供依日期查詢
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_current ON {name} ({key}) WHERE replaced_on IS NULL")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_key ON {name} ({key}, loaded_on)")
+    for col in TABLES[name]['indexes']:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_{col} ON {name} ({q(col)})")
+
+
+def connect(path=DEFAULT_PATH):
+    """開啟參考資料庫，第一次使用時建立各主檔資料表
+
+    每列記錄 seq（匯入順序，同一 key 以較新的為準）、loaded_on（匯入日期）及 replaced_on（被新資料取代的匯入日期，
+    現行資料為空）；內容有變動時舊資料不刪除，查詢時可指定 as_of 查某個匯入日期當時的版本。loads 記錄每次匯入的筆數
+    """
+    conn = sqlite3.connect(path)
+    for name in TABLES:
+        _create(conn, name)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS loads "
+        "(name TEXT, loaded_on TEXT, loaded_at TEXT, rows INTEGER, inserted INTEGER, updated INTEGER)"
+    )
+    return conn
+
+
+def normalize(name, df):
+    """整理成資料表格式：建立 key、型別與每日 mapping 一致，key 重複時保留第一筆"""
+    df = df.copy()
+    if name == 'zsdc':
+        df['先前文件'] = to_int(df['先前文件'])
+        df['key'] = composite_key(df['文件'], df['項目'])
+    else:
+        key = TABLES[name]['key']
+        df[key] = df[key].astype(str)
+    for col in _columns(name):
+        if col not in df.columns:
+            df[col] = None
+    return df.drop_duplicates(subset=TABLES[name]['key'], keep='first')[_columns(name)]
+
+
+def _as_of(as_of):
+    # as_of 為 None 時查現行資料，否則查該日期當時有效的版本（匯入日期 <= as_of，且當時尚未被取代）
+    if as_of is None:
+        return "t.replaced_on IS NULL", []
+    day = as_of.isoformat()
+    return "t.loaded_on <= ? AND (t.replaced_on IS NULL OR t.replaced_on > ?)", [day, day]
+
+
+def _fetch(conn, name, col, keys, as_of=None):
+    # 要查的 key 放進暫存表再 join，走資料表的 key / 索引
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (k PRIMARY KEY)")
+    conn.execute("DELETE FROM wanted")
+    conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", [(k,) for k in dict.fromkeys(keys)])
+    cols = ', '.join(f"t.{q(c)}" for c in _columns(name))
+    where, params = _as_of(as_of)
+    # dtype=object 保留每個值原本的型別（例如整數欄位不會因為有空值變成 float）
+    return pd.read_sql_query(
+        f"SELECT {cols} FROM {name} t JOIN wanted w ON t.{q(col)} = w.k WHERE {where} ORDER BY t.seq", conn, params=params, dtype=object
+    )
+
+
+def upsert(name, df, path=DEFAULT_PATH, loaded_on=None):
+    """匯入主檔（可為完整檔或只含異動的部分），只寫入新增或內容有變動的 key，回傳 (新增筆數, 更新筆數)
+
+    內容有變動的 key 原本的資料標上 replaced_on 保留下來；匯入日期不能早於這張主檔上次的匯入日期
+    """
+    loaded_on = (loaded_on or datetime.date.today()).isoformat()
+    key = TABLES[name]['key']
+    df = normalize(name, df)
+    cols = _columns(name)
+
+    conn = connect(path)
+    try:
+        last = conn.execute(f"SELECT MAX(loaded_on) FROM {name}").fetchone()[0]
+        if last is not None and loaded_on < last:
+            raise ValueError(f"{name} 匯入日期 {loaded_on} 早於上次匯入日期 {last}")
+
+        existing = _fetch(conn, name, key, df[key].tolist()).set_index(key)
+        incoming = df.set_index(key)
+        known = incoming.index.isin(existing.index)
+        old = existing.reindex(incoming.index[known])
+        new = incoming[known].astype(object)
+        same = ((old.astype(object) == new) | (old.isna() & new.isna())).all(axis=1)
+        changed = incoming[known][~same.to_numpy()]
+        added = incoming[~known]
+        rows = pd.concat([added, changed]).reset_index()[cols]
+
+        start = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {name}").fetchone()[0] + 1
+        marks = ', '.join('?' for _ in cols)
+        # 依原檔順序給 seq，同一 先前文件 以後面的為準（與原本 to_dict 的行為一致）
+        order = incoming.index.get_indexer(rows[key])
+        rows = rows.iloc[order.argsort()]
+        with conn:
+            conn.executemany(
+                f"UPDATE {name} SET replaced_on = ? WHERE {q(key)} = ? AND replaced_on IS NULL",
+                [(loaded_on, k) for k in changed.index.tolist()],
+            )
+            conn.executemany(
+                f"INSERT INTO {name} ({', '.join(q(c) for c in cols)}, seq, loaded_on) VALUES ({marks}, ?, ?)",
+                [row + (start + i, loaded_on) for i, row in enumerate(to_rows(rows))],
+            )
+            conn.execute(
+                "INSERT INTO loads VALUES (?, ?, ?, ?, ?, ?)",
+                (name, loaded_on, now(), len(df), len(added), len(changed)),
+            )
+    finally:
+        conn.close()
+    return len(added), len(changed)
+
+
+def load_table(name, path=DEFAULT_PATH, as_of=None):
+    """讀取整張主檔（依匯入順序）；as_of 為日期時讀該日當時有效的版本"""
+    conn = connect(path)
+    try:
+        where, params = _as_of(as_of)
+        cols = ', '.join(f"t.{q(c)}" for c in _columns(name))
+        return pd.read_sql_query(f"SELECT {cols} FROM {name} t WHERE {where} ORDER BY t.seq", conn, params=params, dtype=object)
+    finally:
+        conn.close()
+
+
+def load_log(path=DEFAULT_PATH):
+    conn = connect(path)
+    try:
+        return pd.read_sql_query("SELECT * FROM loads ORDER BY loaded_at DESC", conn)
+    finally:
+        conn.close()
+
+
+def references(df_combined, path=DEFAULT_PATH, as_of=None):
+    """只查出 df_combined 用得到的主檔資料，建成與 daily.prepare_references 相同格式的參考表；as_of 為日期時查該日當時的版本"""
+    conn = connect(path)
+    where, params = _as_of(as_of)
+    try:
+        keys = composite_key(df_combined['參考文件號碼'], df_combined['項目'])
+        zsdc_item = _fetch(conn, 'zsdc', 'key', keys.tolist(), as_of)
+        zsdc_doc = _fetch(conn, 'zsdc', '先前文件', to_int(df_combined['銷售文件']).tolist(), as_of)
+        # 資料表有資料時才做對應（與上傳主檔時檔案為空的行為一致）
+        contract = product = None
+        if conn.execute(f"SELECT 1 FROM contract t WHERE {where} LIMIT 1", params).fetchone():
+            contract_keys = zsdc_doc['合約號碼'].astype(str).tolist() + ['']
+            contract = _fetch(conn, 'contract', '合約編號', contract_keys, as_of)
+        if conn.execute(f"SELECT 1 FROM product t WHERE {where} LIMIT 1", params).fetchone():
+            product = _fetch(conn, 'product', '料號', df_combined['物料'].astype(str).tolist(), as_of)
+    finally:
+        conn.close()
+    return build_references(zsdc_item, zsdc_doc, contract, product)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# 維度欄位：重複值多，存成 category
+CATEGORY_COLS = ['工廠', '課別', '線種', '通路', '分類', '產品群', '客戶名稱', '業務員', 'BUn', '物料', '品名', '報價單號', '採購單', '合約號碼']
+# 整數 key / 項目：依實際數值縮成最小的整數型別
+INT_COLS = ['文件(Billing號)', 'billing項目', '銷售項目', '銷售文件', '客戶', '參考文件號碼', '項目', 'sales_item']
+# 精度需求低、且不會再拿來乘出金額的數值欄位，存成 float32
+FLOAT32_COLS = ['單位用銅', '匯率', '訂單月']
+
+
+def _restore(s):
+    # float32 以最短十進位表示轉回 float64（30.12 不會變成 30.1200008）；只轉不重複的值
+    codes, uniques = pd.factorize(s.to_numpy())
+    values = np.append(uniques.astype(str).astype('float64'), np.nan)
+    return pd.Series(values[codes], index=s.index)
+
+
+def _float32(s):
+    if pd.api.types.is_float_dtype(s) or pd.api.types.is_integer_dtype(s):
+        num = s.astype('float64')
+    else:
+        # object 欄位全是數字（或空值）時才轉；有文字或 '' 就維持原樣，'' 不會變成空值
+        num = pd.to_numeric(s, errors='coerce')
+        if not (num.notna() | s.isna()).all():
+            return s
+    # 轉回來數值完全相同才用 float32，有效位數超過 float32 的欄位維持原樣
+    small = num.astype('float32')
+    if not _restore(small).equals(num):
+        return s
+    return small
+
+
+def to_float64(s):
+    """數值欄位轉 float64；float32 以最短十進位表示轉回，不會多出 30.1200008 這類尾數"""
+    return _restore(s) if s.dtype == 'float32' else s.astype('float64')
+
+
+def compact(df):
+    """依宣告的欄位型別壓縮記憶體用量，匯出前再用 expand 轉回"""
+    for col in df.columns:
+        s = df[col]
+        if col in CATEGORY_COLS and not isinstance(s.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(s):
+            df[col] = s.astype('category')
+        elif col in INT_COLS and pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast='integer')
+        elif col in FLOAT32_COLS:
+            df[col] = _float32(s)
+    return df
+
+
+def expand(df):
+    """compact 的反向：category 轉回一般值，float32 / 縮小的整數轉回 float64 / int64"""
+    df = df.copy()
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            df[col] = s.astype(object)
+        elif s.dtype == 'float32':
+            df[col] = _restore(s)
+        elif pd.api.types.is_integer_dtype(s) and s.dtype != 'int64':
+            df[col] = s.astype('int64')
+    return df
+
+
+def concat(parts):
+    """合併分批結果，category 欄位以聯集合併（直接 pd.concat 會退回 object）"""
+    columns = parts[0].columns
+    result = {}
+    for col in columns:
+        series = [p[col] for p in parts]
+        if all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            try:
+                result[col] = pd.Series(union_categoricals([s.array for s in series]))
+                continue
+            except TypeError:
+                # 各批 category 型別不同（例如一批全是數字），合併後再轉回 category
+                result[col] = pd.concat(series, ignore_index=True).astype(object).astype('category')
+                continue
+        if len({s.dtype for s in series}) > 1:
+            # 各批型別不同（例如一批匯率壓成 float32、另一批有 '' 維持 object）時，float32 先轉回 float64，
+            # 否則合併成 object 後留在裡面的 float32 值匯出時會多出 30.1200008 這類尾數
+            series = [to_float64(s) if s.dtype == 'float32' else s for s in series]
+        result[col] = pd.concat(series, ignore_index=True)
+    return pd.DataFrame(result, columns=columns)
@@ -0,0 +1,16 @@
+import datetime
+
+
+def q(name):
+    """欄名 / 表名加上雙引號（中文及含空白的欄名也能用）"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def to_rows(df):
+    """DataFrame 轉成 executemany 用的 tuple 清單；sqlite 只接受 Python 原生型別，空值轉成 None"""
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return list(zip(*columns))
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classify import M1, M2, classify
+
+MONTH = 10
+民電 = '民電業務部/營業一課'
+公電 = '公電業務部/營業二課'
+
+# (採購單, 課別, 線種, 工廠, 銅量, 分類, 訂單月)；預期值與原本逐列 apply 的結果相同
+CASES = [
+    ('PO 10-1=Y', 民電, '電力', 'SCT1', 1.0, M1, np.nan),
+    ('PO 09-1=Y', 民電, '電力', 'SCT1', 1.0, M2, 9),
+    # 兩個空白：第二段是空字串，不是長約
+    ('PO  09-1=Y', 民電, '電力', 'SCT1', 1.0, '民電', np.nan),
+    # int() 接受底線
+    ('PO 1_0-1=Y', 民電, '電力', 'SCT1', 1.0, M1, np.nan),
+    # 分類不限 1~12，訂單月只取 1~12
+    ('PO 13-1=Y', 民電, '電力', 'SCT1', 1.0, M2, np.nan),
+    # 多個 -1=Y：分類看第二段，訂單月看第一個 -1=Y 前兩碼
+    ('PO 09-1=Y 08-1=Y', 民電, '電力', 'SCT1', 1.0, M2, 9),
+    # 全形數字與 int() 一樣視為數字
+    ('PO 1０-1=Y', 民電, '電力', 'SCT1', 1.0, M1, np.nan),
+    ('PO 0９-1=Y', 民電, '電力', 'SCT1', 1.0, M2, 9),
+    ('PO 10-1=Y', 民電, '電力', 'SCT1', 0.0, M1, np.nan),
+    ('PO 10-1=N', 民電, '電力', 'SCT1', 0.0, '無', np.nan),
+    # 非字串的採購單一律不是長約
+    (5, 公電, '電力', ' SCDM ', 1.0, '無', np.nan),
+    (None, 公電, '通信', ' SCT1 ', 1.0, '通信', np.nan),
+    (np.nan, 公電, '電力', 'SCT1', 1.0, '公電', np.nan),
+    ('', 民電, '通信', 'SCDM', 1.0, '通信', np.nan),
+    ('', '產業一課', '電力', 'SCDM', 1.0, '外銷', np.nan),
+    ('', '國際業務部', '通信', 'SCDM', 1.0, '外銷', np.nan),
+    ('', '電力專案部', '通信', 'SCDM', 1.0, '通信', np.nan),
+    ('', '電力專案部', '電力', 'SCDM', 1.0, '', np.nan),
+    ('', '', '', '', 1.0, '', np.nan),
+]
+
+
+def _frame(cases):
+    return pd.DataFrame(
+        [case[:5] for case in cases],
+        columns=['採購單', '課別', '線種', '工廠', '銅量'],
+    ).astype({'採購單': object})
+
+
+@pytest.mark.parametrize('case', CASES, ids=[repr(c[0]) for c in CASES])
+def test_classify_case(case):
+    category, order_month = classify(_frame([case]), MONTH)
+    assert category.iloc[0] == case[5]
+    if np.isnan(case[6]):
+        assert np.isnan(order_month.iloc[0])
+    else:
+        assert order_month.iloc[0] == case[6]
+
+
+def test_classify_table_matches_row_by_row():
+    # 整張表一起算與逐列算結果相同（採購單只解析不重複的值）
+    df = _frame(CASES * 3)
+    category, order_month = classify(df, MONTH)
+    assert category.tolist() == [c[5] for c in CASES] * 3
+    expected = pd.Series([c[6] for c in CASES] * 3, dtype='float64')
+    pd.testing.assert_series_equal(order_month.reset_index(drop=True), expected, check_names=False)
+
+
+def test_classify_categorical_input():
+    # compact 過的 category 欄位結果相同
+    df = _frame(CASES)
+    for col in ['課別', '線種', '工廠']:
+        df[col] = df[col].astype('category')
+    category, _ = classify(df, MONTH)
+    assert category.tolist() == [c[5] for c in CASES]
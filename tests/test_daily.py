@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from classify import M2
+from daily import OUTPUT_COLS, combine, map_combined, prepare_references
+from schema import expand
+
+DATE = pd.Timestamp('2026-10-05')
+
+
+def _sales():
+    # 0：zsdc 有對應、合約有對應；1：zsdc 有對應但淨重空白、合約對不到；2：zsdc 沒有對應（品名由產品群補）
+    return pd.DataFrame({
+        '參考文件號碼': [9100000001, 9100000002, 9100000003], '項目': [10, 10, 10], '物料': ['G1', 'G1', '6A'],
+        '工廠': ['SCDM', 'SCT1', 'SCDM'], '客戶': [1, 2, 3], '銷售文件': [20000001, 20000002, 20000003], '項目.1': [10, 20, 30],
+        '以 PCLC 計': [100.0, 200.0, -50.0], '數量': [10.0, 20.0, -2.0], '過帳日期': DATE, 'BUn': 'M', '輸入日期': DATE,
+    })
+
+
+def _references():
+    zsdc = pd.DataFrame({
+        '文件': [9100000001, 9100000002], '項目': [10, 10], '先前文件': [20000001, 20000002],
+        '物料說明': ['電纜A', '電纜B'], '淨重': [1.5, None], 'bill-to-name': ['客戶一', '客戶二'],
+        '合約號碼': ['K1', 'K9'], '採購單號碼': ['PO 09-1=Y', 'PO123'],
+    })
+    contract = pd.DataFrame({
+        '合約編號': ['K1'], '產品部': ['銅通信電纜'], '通路': ['電力'], '部門': ['民電業務部/營業一課'], '報價單號': ['Q1'],
+        '匯率': [30.12], '業務': ['業務01'], '報價銅價': [300.0],
+    })
+    product = pd.DataFrame({'料號': ['G1', '6A'], '產品群': ['P01', 'P02'], '品名': ['G1 品名', '6A 品名']})
+    return prepare_references(zsdc, contract, product)
+
+
+@pytest.fixture
+def output():
+    df = expand(map_combined(combine(_sales(), pd.DataFrame()), _references(), 10))
+    assert list(df.columns) == OUTPUT_COLS
+    return df
+
+
+def test_matched_row(output):
+    row = output.iloc[0]
+    assert (row['品名'], row['產品群'], row['客戶名稱'], row['合約號碼'], row['採購單']) == ('電纜A', 'P01', '客戶一', 'K1', 'PO 09-1=Y')
+    assert (row['線種'], row['通路'], row['課別'], row['報價單號'], row['業務員']) == ('通信', '經銷長約', '民電業務部/營業一課', 'Q1', '業務01')
+    # combine 時數量及金額取負號
+    assert (row['單位用銅'], row['銅量'], row['報價銅'], row['報價銅成本'], row['匯率']) == (1.5, -15.0, 300.0, -4500.0, 30.12)
+    assert (row['分類'], row['訂單月']) == (M2, 9)
+
+
+def test_zsdc_match_with_empty_weight(output):
+    # 淨重空白時銅量為 0（不是沒有 zsdc 對應），合約對不到時合約欄位為 ''
+    row = output.iloc[1]
+    assert (row['品名'], row['客戶名稱'], row['合約號碼']) == ('電纜B', '客戶二', 'K9')
+    assert (row['線種'], row['通路'], row['課別'], row['報價單號'], row['匯率'], row['業務員']) == ('電力', '', '', '', '', '')
+    assert (row['單位用銅'], row['銅量'], row['報價銅'], row['報價銅成本']) == (0.0, 0.0, 0.0, 0.0)
+    assert row['分類'] == '無' and pd.isna(row['訂單月'])
+
+
+def test_unmatched_zsdc_row(output):
+    # 沒有 zsdc 對應：數值欄位為空值、分類為 ''，品名由產品群補上
+    row = output.iloc[2]
+    assert (row['品名'], row['產品群'], row['客戶名稱'], row['合約號碼'], row['採購單'], row['分類']) == ('6A 品名', 'P02', '', '', '', '')
+    assert all(pd.isna(row[c]) for c in ['單位用銅', '銅量', '報價銅', '報價銅成本', '匯率'])
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from export import HAS_PARQUET, export
+
+
+@pytest.mark.skipif(not HAS_PARQUET, reason="未安裝 pyarrow")
+def test_parquet_keeps_numbers_with_blanks():
+    df = pd.DataFrame({
+        # 沒對到合約時匯率為 ''
+        '匯率': pd.Series([30.12, '', 31.5, None], dtype=object),
+        '客戶': pd.Series([100001, '', 100002, 100003], dtype=object),
+        '採購單': pd.Series(['PO 09-1=Y', 123456, '', None], dtype=object),
+    })
+    result = pd.read_parquet(export(df, 'parquet'))
+    assert result['匯率'].dtype == 'float64'
+    assert result['匯率'].dropna().tolist() == [30.12, 31.5]
+    assert result['匯率'].isna().tolist() == [False, True, False, True]
+    assert result['客戶'].tolist()[2:] == [100002, 100003]
+    # 文字與數字混合的欄位才轉成文字
+    assert result['採購單'].tolist()[:3] == ['PO 09-1=Y', '123456', '']
+    assert pd.isna(result['採購單'].iloc[3])
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from ingest import load_input, read_header
+
+
+def _write(path, df, sheet_name='工作表1', header=None):
+    with pd.ExcelWriter(path) as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=False, header=header if header is not None else True)
+
+
+def _sales():
+    df = pd.DataFrame({
+        '參考文件號碼': [9100000001, 9100000002], '公司代碼': ['TW01', 'TW01'], '項目': [10, 20], '物料': ['G1', '6A'],
+        '工廠': [' SCDM ', 'SCT1'], '客戶': [1, 2], '銷售文件': [20000001, 20000002], '項目.1': [10, 20],
+        '以 PCLC 計': [100.0, 200.5], '數量': [1, 2], '過帳日期': pd.to_datetime(['2026-10-01', '2026-10-02']),
+        'BUn': ['M', 'KG'], '輸入日期': pd.to_datetime(['2026-10-01', '2026-10-02']),
+    })
+    # 實際檔案兩個欄位都叫 '項目'
+    return df, ['項目' if c == '項目.1' else c for c in df.columns]
+
+
+def test_read_header_matches_read_excel(tmp_path):
+    df, header = _sales()
+    _write(tmp_path / 'sales.xlsx', df, header=header)
+    expected = [str(c).strip() for c in pd.read_excel(tmp_path / 'sales.xlsx', nrows=0).columns]
+    assert read_header(tmp_path / 'sales.xlsx', '工作表1') == expected
+
+
+def test_load_input_projects_columns(tmp_path):
+    df, header = _sales()
+    _write(tmp_path / 'sales.xlsx', df, header=header)
+    result = load_input(tmp_path / 'sales.xlsx', 'sales')
+    assert '公司代碼' not in result.columns
+    pd.testing.assert_frame_equal(result, pd.read_excel(tmp_path / 'sales.xlsx')[result.columns], check_dtype=False)
+
+
+def test_load_input_missing_column(tmp_path):
+    df, header = _sales()
+    _write(tmp_path / 'sales.xlsx', df.drop(columns=['BUn']), header=[c for c in header if c != 'BUn'])
+    with pytest.raises(ValueError, match='BUn'):
+        load_input(tmp_path / 'sales.xlsx', 'sales')
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+import ledger
+from daily import OUTPUT_COLS
+from classify import M1, M2
+
+
+def _daily(docs, items, classes):
+    df = pd.DataFrame('', index=range(len(docs)), columns=OUTPUT_COLS, dtype=object)
+    df['文件(Billing號)'] = docs
+    df['billing項目'] = items
+    df['分類'] = classes
+    df['合約號碼'] = ''
+    df['銅量'] = 1.0
+    df['報價銅'] = 300.0
+    df['報價銅成本'] = 300.0
+    df['匯率'] = ''
+    return df
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'ledger.sqlite')
+
+
+def test_upsert_reports_duplicate_keys(path):
+    df = _daily([9100000001, 9100000001, 9100000002], [10, 10, 10], ['', '', ''])
+    df.loc[1, '報價銅'] = 310.0
+    assert ledger.upsert(df, path) == (2, 1)
+    row = ledger.load(path).iloc[0]
+    assert float(row['報價銅']) == 310.0
+
+
+def test_month_end_keeps_overrides_out_of_rows(path):
+    ledger.upsert(_daily([9100000001], [10], [M1]), path)
+    ledger.set_override(9100000001, 10, '報價銅', 111, path)
+
+    df = ledger.month_end(None, 305.0, 30.12, {}, {}, path)
+    row = df.iloc[0]
+    assert float(row['報價銅']) == 111
+    assert float(row['報價銅成本']) == 111
+
+    ledger.set_override(9100000001, 10, '報價銅', None, path)
+    row = ledger.load(path).iloc[0]
+    assert float(row['報價銅']) == 305
+    assert float(row['報價銅成本']) == 305
+    assert float(row['匯率']) == pytest.approx(30.12)
+
+
+def test_override_recomputes_cost(path):
+    ledger.upsert(_daily([9100000001], [10], ['']), path)
+    ledger.set_override(9100000001, 10, '銅量', 2, path)
+    assert float(ledger.load(path).iloc[0]['報價銅成本']) == 600
+
+
+def test_derived_column_cannot_be_overridden(path):
+    ledger.upsert(_daily([9100000001], [10], ['']), path)
+    with pytest.raises(ValueError):
+        ledger.set_override(9100000001, 10, '報價銅成本', 1, path)
+
+
+def test_month_end_uses_class_override(path):
+    ledger.upsert(_daily([9100000001, 9100000002], [10, 10], ['', '']), path)
+    ledger.set_override(9100000001, 10, '分類', M1, path)
+
+    df = ledger.month_end(None, 305.0, 30.12, {}, {}, path).set_index('文件(Billing號)')
+    assert df.loc[9100000001, '分類'] == M1
+    assert float(df.loc[9100000001, '報價銅']) == 305
+    assert float(df.loc[9100000001, '報價銅成本']) == 305
+    assert float(df.loc[9100000002, '報價銅']) == 300
+
+
+def test_month_end_uses_order_month_override(path):
+    ledger.upsert(_daily([9100000001], [10], [M2]), path)
+    ledger.set_override(9100000001, 10, '訂單月', 9, path)
+
+    row = ledger.month_end(None, 305.0, 30.12, {9: 298.0}, {9: 29.85}, path).iloc[0]
+    assert float(row['報價銅']) == 298
+    assert float(row['匯率']) == pytest.approx(29.85)
+
+    # 修正不寫進帳本：取消後 訂單月 回到原本的空值
+    ledger.set_override(9100000001, 10, '訂單月', None, path)
+    assert pd.isna(ledger.load(path).iloc[0]['訂單月'])
@@ -0,0 +1,97 @@
+import zipfile
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+import pytest
+import xlsxwriter
+
+import engine
+from classify import M1, M2
+from export import export
+from monthly import patch_accumulated
+
+HEADER = ['分類', '採購單', '合約號碼', '報價銅', '匯率', '銅量', '報價銅成本']
+
+
+def _accumulated(rows, chart=False):
+    output = BytesIO()
+    wb = xlsxwriter.Workbook(output)
+    ws = wb.add_worksheet('data實績')
+    ws.write_row(0, 0, ['隱藏1'])
+    ws.write_row(1, 0, ['隱藏2'])
+    ws.set_row(0, None, None, {'hidden': True})
+    ws.set_row(1, None, None, {'hidden': True})
+    ws.write_row(2, 0, HEADER)
+    for i, row in enumerate(rows, start=3):
+        for j, value in enumerate(row):
+            if isinstance(value, str) and value.startswith('='):
+                ws.write_formula(i, j, value)
+            elif value is not None:
+                ws.write(i, j, value)
+    if chart:
+        c = wb.add_chart({'type': 'column'})
+        c.add_series({'values': ['data實績', 3, 6, 2 + len(rows), 6]})
+        ws.insert_chart('J2', c)
+    wb.close()
+    return output.getvalue()
+
+
+def _values(output):
+    ws = openpyxl.load_workbook(output)['data實績']
+    return [[cell.value for cell in row] for row in ws.iter_rows(min_row=4, max_col=len(HEADER))]
+
+
+def test_patch_integer_columns():
+    # 報價銅 / 匯率 / 報價銅成本 整欄都是整數
+    data = _accumulated([[M1, 'PO', 'K1', 300, 30, 2, 600], ['通信', 'PO', 'K1', 300, 30, 2, 600]])
+    output, df, count = patch_accumulated(data, None, 305.0, 30.12, {}, {})
+    assert count == 3
+    assert _values(output) == [[M1, 'PO', 'K1', 305, 30.12, 2, 610], ['通信', 'PO', 'K1', 300, 30, 2, 600]]
+    assert df['報價銅'].tolist() == [305.0, 300.0]
+    assert df['匯率'].tolist() == [30.12, 30.0]
+
+
+def test_patch_keeps_charts_formulas_and_hidden_rows():
+    data = _accumulated([[M1, 'PO', 'K1', 300.5, None, 2, '=D4*F4'], [M1, 'PO', 'K1', 300.5, 30.5, 2, 601]], chart=True)
+    output, _, count = patch_accumulated(data, None, 305.0, 30.12, {}, {})
+    # 公式儲存格不覆寫，空白的匯率儲存格補上
+    assert count == 5
+    # 圖表原樣保留
+    with zipfile.ZipFile(BytesIO(data)) as zin, zipfile.ZipFile(output) as zf:
+        assert zf.read('xl/charts/chart1.xml') == zin.read('xl/charts/chart1.xml')
+        assert b'fullCalcOnLoad="1"' in zf.read('xl/workbook.xml')
+    ws = openpyxl.load_workbook(output)['data實績']
+    assert ws.row_dimensions[1].hidden and ws.row_dimensions[2].hidden
+    assert ws['G4'].value == '=D4*F4'
+    assert [ws['D4'].value, ws['E4'].value, ws['E5'].value, ws['G5'].value] == [305, 30.12, 30.12, 610]
+
+
+@pytest.mark.parametrize('quote', [None, {'合約編號': ['K1'], '銅價+銅價調整': [310.0], '匯率': [29.85]}])
+def test_patch_counts_quote_cells(quote):
+    data = _accumulated([['通信', 'PO', 'K1', 300, 30, 2, 600], ['通信', 'PO', 'K2', 300, 30, 2, 600]])
+    df_quote = pd.DataFrame(quote) if quote else None
+    output, df, count = patch_accumulated(data, df_quote, 305.0, 30.12, {}, {})
+    assert len(df) == 2
+    assert count == (3 if quote else 0)
+
+
+def _month_end_rows():
+    return [
+        [M1, 'PO', 'K9', 300.0, 30.5, 2.0, 600.0],
+        [M2, 'PO 09-1=Y', 'K9', 300.0, 30.5, 2.0, 600.0],
+        ['通信', 'PO', 'K1', 300.0, 30.5, 2.0, 600.0],
+        ['通信', 'PO', 'K9', 300.0, 31.33, 2.0, 600.0],
+    ]
+
+
+@pytest.mark.parametrize('quote', [False, True])
+def test_run_monthly_exact_values(quote):
+    data = _accumulated(_month_end_rows())
+    df_quote = pd.DataFrame({'合約編號': ['K1'], '銅價+銅價調整': [310.0], '匯率': [30.12]}) if quote else None
+    df, _, _ = engine.run_monthly(data, df_quote, 305.0, 29.85, {9: 298.0}, {9: 30.12})
+
+    result = pd.read_csv(export(df, 'csv'), encoding='utf-8-sig', dtype=str)
+    assert result['報價銅'].tolist() == ['305.0', '298.0', '310.0' if quote else '300.0', '300.0']
+    assert result['匯率'].tolist() == ['29.85', '30.12', '30.12' if quote else '30.5', '31.33']
+    assert result['報價銅成本'].tolist() == ['610.0', '596.0', '620.0' if quote else '600.0', '600.0']
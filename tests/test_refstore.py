@@ -0,0 +1,62 @@
+import datetime
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import refstore
+
+DAY1, DAY2, DAY3 = datetime.date(2026, 9, 1), datetime.date(2026, 10, 1), datetime.date(2026, 11, 1)
+
+
+def _contract(rates):
+    return pd.DataFrame({
+        '合約編號': list(rates), '產品部': 'P', '通路': 'C', '部門': 'D', '報價單號': 'Q',
+        '匯率': list(rates.values()), '業務': 'S', '報價銅價': 300.0,
+    })
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'reference.sqlite')
+
+
+def _rates(df):
+    return dict(zip(df['合約編號'], df['匯率'].astype(float)))
+
+
+def test_changed_rows_are_versioned(path):
+    assert refstore.upsert('contract', _contract({'K1': 30.0, 'K2': 31.0}), path, DAY1) == (2, 0)
+    assert refstore.upsert('contract', _contract({'K1': 29.5, 'K3': 32.0}), path, DAY2) == (1, 1)
+
+    assert _rates(refstore.load_table('contract', path)) == {'K1': 29.5, 'K2': 31.0, 'K3': 32.0}
+    assert _rates(refstore.load_table('contract', path, as_of=DAY1)) == {'K1': 30.0, 'K2': 31.0}
+    assert _rates(refstore.load_table('contract', path, as_of=DAY3)) == {'K1': 29.5, 'K2': 31.0, 'K3': 32.0}
+    assert refstore.load_table('contract', path, as_of=datetime.date(2026, 8, 1)).empty
+
+
+def test_unchanged_rows_are_not_versioned(path):
+    refstore.upsert('contract', _contract({'K1': 30.0}), path, DAY1)
+    assert refstore.upsert('contract', _contract({'K1': 30.0}), path, DAY2) == (0, 0)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM contract").fetchone()[0] == 1
+
+
+def test_earlier_load_date_is_rejected(path):
+    refstore.upsert('contract', _contract({'K1': 30.0}), path, DAY2)
+    with pytest.raises(ValueError):
+        refstore.upsert('contract', _contract({'K1': 29.0}), path, DAY1)
+
+
+def test_references_as_of(path):
+    zsdc = pd.DataFrame({
+        '文件': [9100000001], '項目': [10], '先前文件': [20000001], '物料說明': ['M'], '淨重': [1.0],
+        'bill-to-name': ['客戶'], '合約號碼': ['K1'], '採購單號碼': ['PO'],
+    })
+    refstore.upsert('zsdc', zsdc, path, DAY1)
+    refstore.upsert('contract', _contract({'K1': 30.0}), path, DAY1)
+    refstore.upsert('contract', _contract({'K1': 29.5}), path, DAY2)
+    combined = pd.DataFrame({'參考文件號碼': [9100000001], '項目': [10], '銷售文件': [20000001], '物料': ['G1']})
+
+    assert refstore.references(combined, path)['contract'].loc['K1', '匯率'] == 29.5
+    assert refstore.references(combined, path, as_of=DAY1)['contract'].loc['K1', '匯率'] == 30.0
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from schema import compact, concat, expand, to_float64
+
+
+def test_float32_round_trip():
+    df = compact(pd.DataFrame({'匯率': [30.12, 29.85, np.nan], '單位用銅': [0.123456789012, 1.5, 2.0]}))
+    assert df['匯率'].dtype == 'float32'
+    # 有效位數超過 float32 的欄位不壓縮
+    assert df['單位用銅'].dtype == 'float64'
+    assert expand(df)['匯率'].tolist()[:2] == [30.12, 29.85]
+    assert to_float64(df['匯率']).tolist()[:2] == [30.12, 29.85]
+
+
+def test_empty_string_is_kept():
+    # 每日結果沒有對到合約時匯率為 ''，compact 後不能變成空值
+    df = compact(pd.DataFrame({'匯率': pd.Series([30.12, '', None], dtype=object)}))
+    assert expand(df)['匯率'].tolist()[:2] == [30.12, '']
+
+
+def test_concat_mixed_float32_and_object():
+    # 一批匯率全是數字（float32），另一批有 ''（object）
+    parts = [compact(pd.DataFrame({'匯率': [30.12, None]})), compact(pd.DataFrame({'匯率': pd.Series([30.12, ''], dtype=object)}))]
+    assert parts[0]['匯率'].dtype == 'float32'
+    assert expand(concat(parts))['匯率'].tolist()[::2] == [30.12, 30.12]
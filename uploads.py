@@ -0,0 +1,21 @@
+import hashlib
+
+import streamlit as st
+
+from ingest import load_input
+
+# 同時保留的解析結果數量（每日 5 個上傳檔 + 月底 2 個，留一些餘裕給換檔）
+MAX_CACHED = 16
+
+
+@st.cache_data(max_entries=MAX_CACHED, show_spinner=False)
+def _parse_excel(digest, name, _data):
+    # _data 以底線開頭，不參與快取 key 的計算，key 只看 digest + 輸入種類（決定分頁及欄位）
+    return load_input(_data, name)
+
+
+def read_upload(file, name):
+    """讀取上傳的 Excel（name 見 ingest.INPUTS），依檔案內容 hash + 輸入種類快取解析結果，重跑時不必再解析 xlsx"""
+    data = file.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    return _parse_excel(digest, name, data)